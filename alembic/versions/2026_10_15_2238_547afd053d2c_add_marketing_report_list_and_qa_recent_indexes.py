@@ -0,0 +1,62 @@
+"""add marketing report list and qa recent indexes
+
+Revision ID: 547afd053d2c
+Revises: f360b02a680c
+Create Date: 2026-10-15 22:38:00.000000
+
+"""
+from typing import Any, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '547afd053d2c'
+down_revision: Union[str, None] = 'f360b02a680c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_index(name: str, table: str, columns: list[Any], **kw: Any) -> None:
+    """
+    辅助: 在线建索引 (CONCURRENTLY，不阻塞写入；已存在时跳过，可重复执行)
+    """
+    op.create_index(
+        name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw
+    )
+
+
+def _drop_index(name: str, table: str) -> None:
+    """
+    辅助: 在线删除索引 (CONCURRENTLY；不存在时跳过)
+    """
+    op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY 不能在事务块中执行
+    with op.get_context().autocommit_block():
+        # 1. 营销报告列表覆盖索引 (get_flat_reports)
+        _create_index(
+            'ix_mk_report_user_mkt_pstart',
+            'marketing_report',
+            ['user_id', 'marketplace_id', sa.text('period_start DESC')],
+            postgresql_include=[
+                'period_end', 'report_type', 'report_source', 'pdf_path',
+                'id', 'week', 'ad_type',
+            ],
+        )
+
+        # 2. 营销问答: 最近历史窗口 (get_recent_history)
+        _create_index(
+            'ix_mk_qa_report_recent',
+            'marketing_report_qa',
+            ['report_id', 'status', sa.text('created_at DESC')],
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_index('ix_mk_qa_report_recent', 'marketing_report_qa')
+        _drop_index('ix_mk_report_user_mkt_pstart', 'marketing_report')
@@ -0,0 +1,56 @@
+"""add operations report period index
+
+Revision ID: d0367eec3868
+Revises: 547afd053d2c
+Create Date: 2026-10-15 22:44:00.000000
+
+"""
+from typing import Any, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd0367eec3868'
+down_revision: Union[str, None] = '547afd053d2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_index(name: str, table: str, columns: list[Any], **kw: Any) -> None:
+    """
+    辅助: 在线建索引 (CONCURRENTLY，不阻塞写入；已存在时跳过，可重复执行)
+    """
+    op.create_index(
+        name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw
+    )
+
+
+def _drop_index(name: str, table: str) -> None:
+    """
+    辅助: 在线删除索引 (CONCURRENTLY；不存在时跳过)
+    """
+    op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY 不能在事务块中执行
+    with op.get_context().autocommit_block():
+        # 运营报告列表覆盖索引 (DENSE_RANK 周期查询)
+        _create_index(
+            'ix_ops_report_user_mkt_period',
+            'operations_report',
+            [
+                'user_id', 'marketplace_id',
+                sa.text('period_start DESC'), sa.text('period_end DESC'),
+            ],
+            postgresql_include=[
+                'id', 'week', 'ad_type', 'report_type', 'report_source', 'pdf_path',
+            ],
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_index('ix_ops_report_user_mkt_period', 'operations_report')
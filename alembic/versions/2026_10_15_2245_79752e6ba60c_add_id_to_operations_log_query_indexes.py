@@ -0,0 +1,64 @@
+"""add id to operations log query indexes
+
+Revision ID: 79752e6ba60c
+Revises: d0367eec3868
+Create Date: 2026-10-15 22:45:00.000000
+
+"""
+from typing import Any, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '79752e6ba60c'
+down_revision: Union[str, None] = 'd0367eec3868'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 日志表复合索引的公共前缀列 (ix_ops_change_query / ix_ops_audit_query)
+_LOG_QUERY_COLUMNS = [
+    'user_id', 'marketplace_id', 'period_start', 'period_end', 'category',
+]
+_LOG_INDEXES = (
+    ('ix_ops_change_query', 'operations_change_log'),
+    ('ix_ops_audit_query', 'operations_audit_log'),
+)
+
+
+def _create_index(name: str, table: str, columns: list[Any], **kw: Any) -> None:
+    """
+    辅助: 在线建索引 (CONCURRENTLY，不阻塞写入；已存在时跳过，可重复执行)
+    """
+    op.create_index(
+        name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw
+    )
+
+
+def _drop_index(name: str, table: str) -> None:
+    """
+    辅助: 在线删除索引 (CONCURRENTLY；不存在时跳过)
+    """
+    op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CREATE/DROP INDEX CONCURRENTLY 不能在事务块中执行
+    with op.get_context().autocommit_block():
+        # created_at 倒序 + id 作为 Keyset 分页的稳定排序键 (重建)
+        for name, table in _LOG_INDEXES:
+            _drop_index(name, table)
+            _create_index(
+                name,
+                table,
+                [*_LOG_QUERY_COLUMNS, sa.text('created_at DESC'), sa.text('id DESC')],
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in _LOG_INDEXES:
+            _drop_index(name, table)
+            _create_index(name, table, [*_LOG_QUERY_COLUMNS, 'created_at'])
@@ -0,0 +1,55 @@
+"""include status in marketing qa timeline index
+
+Revision ID: 7fdc28cdb007
+Revises: 79752e6ba60c
+Create Date: 2026-10-15 23:01:00.000000
+
+"""
+from typing import Any, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7fdc28cdb007'
+down_revision: Union[str, None] = '79752e6ba60c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_index(name: str, table: str, columns: list[Any], **kw: Any) -> None:
+    """
+    辅助: 在线建索引 (CONCURRENTLY，不阻塞写入；已存在时跳过，可重复执行)
+    """
+    op.create_index(
+        name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kw
+    )
+
+
+def _drop_index(name: str, table: str) -> None:
+    """
+    辅助: 在线删除索引 (CONCURRENTLY；不存在时跳过)
+    """
+    op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CREATE/DROP INDEX CONCURRENTLY 不能在事务块中执行
+    with op.get_context().autocommit_block():
+        # 营销问答时间轴索引追加 INCLUDE status (重建)
+        _drop_index('ix_mk_qa_report_timeline', 'marketing_report_qa')
+        _create_index(
+            'ix_mk_qa_report_timeline',
+            'marketing_report_qa',
+            ['report_id', 'created_at'],
+            postgresql_include=['status'],
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_index('ix_mk_qa_report_timeline', 'marketing_report_qa')
+        _create_index(
+            'ix_mk_qa_report_timeline', 'marketing_report_qa', ['report_id', 'created_at']
+        )
@@ -39,6 +39,7 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     ENVIRONMENT: Literal["local", "dev", "prod"] = "local"
     DEBUG: bool = False
+    WEB_WORKERS: int = 1  # 直接运行 app.main 时的 uvicorn 工作进程数
 
     # 密钥 (生产环境强制要求高强度随机串)
     # 用于 Session 签名和 JWT 加密
@@ -58,10 +59,12 @@ class Settings(BaseSettings):
 
     # 连接池配置 (Pool Settings)
     DB_POOL_SIZE: int = 20  # 连接池基准大小
-    DB_MAX_OVERFLOW: int = 10  # 允许超出基准的额外连接数
+    DB_MAX_OVERFLOW: int = 40  # 允许超出基准的额外连接数 (吸收 SSE 并发突发)
     DB_POOL_PRE_PING: bool = True  # 每次获取连接前是否自动 ping
     DB_POOL_TIMEOUT: int = 30  # 连接获取超时（秒）
     DB_POOL_RECYCLE: int = 1800  # 连接回收时间（秒），防止连接过期
+    DB_QUERY_CACHE_SIZE: int = 1200  # 编译语句缓存容量 (SQLAlchemy 默认 500)
+    DB_STATEMENT_CACHE_SIZE: int = 200  # 每连接预编译语句缓存容量 (asyncpg 默认 100)
 
     # 完整 DSN 覆盖（可选）
     SQLALCHEMY_DATABASE_URI: str | None = None
@@ -108,6 +111,13 @@ class Settings(BaseSettings):
     # 模型名称 (支持 deepseek-chat 或 deepseek-reasoner)
     DEEPSEEK_MODEL: str = "deepseek-reasoner"
 
+    # LLM HTTP 连接池 (全局共享，见 app/core/llm.py)
+    LLM_MAX_CONNECTIONS: int = 200  # 最大并发连接数
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 50  # 最大保活连接数
+
+    # 多轮对话历史的 Token 预算 (按近似估算裁剪，优先保留最近的问答)
+    LLM_HISTORY_TOKEN_BUDGET: int = 4000
+
     # --------------------------------------------------------------------------
     # Properties (便捷属性)
     # --------------------------------------------------------------------------
@@ -0,0 +1,106 @@
+"""
+File: app/core/llm.py
+Description: LLM 客户端管理 (DeepSeek / OpenAI 兼容协议)
+
+本模块负责：
+1. 维护全局唯一的 AsyncOpenAI 客户端 (共享底层 httpx 连接池)
+2. 复用 Keep-Alive 连接，避免每个请求重新建立 TCP/TLS 握手
+3. 管理客户端生命周期 (按需初始化与关闭)
+4. 多轮对话历史按 Token 预算裁剪
+
+注意：
+客户端采用惰性初始化 (首次调用时创建)，
+避免在未配置 DEEPSEEK_API_KEY 的环境 (如测试、脚本) 中导入即失败。
+
+Author: jinmozhe
+Created: 2026-02-14
+"""
+
+from collections.abc import Iterable, Sequence
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from app.core.config import settings
+
+# ------------------------------------------------------------------------------
+# 全局 LLM 客户端实例 (Singleton)
+# ------------------------------------------------------------------------------
+_llm_client: AsyncOpenAI | None = None
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """
+    获取全局 LLM 客户端。
+
+    所有 QA Service 共享同一个实例，从而共享 httpx 连接池：
+    热连接可直接复用，首 Token 延迟不再包含握手开销。
+    """
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = AsyncOpenAI(
+            api_key=settings.DEEPSEEK_API_KEY,
+            base_url=settings.DEEPSEEK_BASE_URL,
+            timeout=60.0,
+            max_retries=2,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+        )
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """
+    关闭 LLM 客户端连接池。
+    应在 FastAPI 应用的 lifespan shutdown 事件中调用。
+    """
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.close()
+        _llm_client = None
+
+
+# ------------------------------------------------------------------------------
+# 对话历史裁剪 (Token Budget)
+# ------------------------------------------------------------------------------
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    近似估算文本的 Token 数 (无需加载分词器)。
+
+    参照 DeepSeek 官方换算：1 个中文字符 ≈ 0.6 Token，1 个英文字符 ≈ 0.3 Token。
+    非 ASCII 字符数由 UTF-8 编码长度差推算 (CJK 字符占 3 字节)，全程在 C 层完成。
+    """
+    chars = len(text)
+    wide = (len(text.encode("utf-8")) - chars) // 2
+    return int(wide * 0.6 + (chars - wide) * 0.3) + 1
+
+
+def trim_history(
+    history: Iterable[Sequence[str | None]], budget: int
+) -> list[tuple[str, str]]:
+    """
+    按 Token 预算裁剪历史问答 (输入/输出均为时间正序)。
+
+    从最近一轮向前贪心累加，超出预算即停止，保证保留的是最近且连续的对话；
+    问题或回答为空的记录直接跳过。
+
+    Args:
+        history: [(question, answer), ...] (旧 -> 新)
+        budget: 历史消息可用的 Token 上限
+    """
+    pairs = [(q, a) for q, a in history if q and a]
+    kept: list[tuple[str, str]] = []
+    used = 0
+    for question, answer in reversed(pairs):
+        used += estimate_tokens(question) + estimate_tokens(answer)
+        if used > budget:
+            break
+        kept.append((question, answer))
+    kept.reverse()
+    return kept
@@ -66,11 +66,20 @@ def format_record(record: dict[str, Any]) -> str:
     return format_string
 
 
+# 是否已完成初始化 (重复导入 / 多次创建应用时保持幂等)
+_configured = False
+
+
 def setup_logging() -> None:
     """
     初始化日志配置。
-    应在 main.py 启动时调用。
+    由 create_app() 在应用创建时同步调用；重复调用为空操作。
     """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
     # 1. 拦截标准库日志 (Uvicorn / FastAPI)
     logging.root.handlers = [InterceptHandler()]
     logging.root.setLevel(settings.LOG_LEVEL)
@@ -8,7 +8,9 @@ Description: 中间件配置与实现
    - 绑定 Loguru 上下文
    - 记录访问日志 (Access Log)
    - 添加 X-Request-ID 响应头
-2. 提供 register_middlewares 函数：
+2. 定义 HealthCheckShortcutMiddleware：
+   - 纯 ASGI 实现，健康检查请求直接应答，不经过路由与其他中间件
+3. 提供 register_middlewares 函数：
    - 统一注册 CORS、RequestLogMiddleware 等
 
 Author: jinmozhe
@@ -21,10 +23,12 @@ from collections.abc import Awaitable, Callable
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from uuid6 import uuid7
+from starlette.types import ASGIApp, Receive, Scope, Send
+from uuid_utils.compat import uuid7
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.response import ResponseModel
 
 # 跳过详细日志的路径（健康检查等高频低价值请求）
 SKIP_LOG_PATHS: set[str] = {"/health", "/health/", "/metrics", "/favicon.ico"}
@@ -96,6 +100,32 @@ class RequestLogMiddleware(BaseHTTPMiddleware):
                 raise
 
 
+class HealthCheckShortcutMiddleware:
+    """
+    健康检查快速通道 (纯 ASGI 中间件，应注册为最外层)
+
+    K8s 探针 / 负载均衡器高频探测的健康检查无业务意义，
+    命中指定路径时直接返回统一响应信封，跳过 CORS、请求日志 (UUID 生成/计时) 与路由匹配。
+    路由本身仍保留，用于生成 OpenAPI 文档。
+    """
+
+    def __init__(self, app: ASGIApp, path: str, data: dict[str, str]) -> None:
+        self.app = app
+        self.path = path
+        self.data = data
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["path"] == self.path
+            and scope["method"] in ("GET", "HEAD")
+        ):
+            response = ResponseModel.success_response(self.data)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
 def register_middlewares(app: FastAPI) -> None:
     """
     统一注册所有中间件。
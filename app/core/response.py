@@ -10,14 +10,33 @@ Created: 2025-11-24
 Updated: 2026-02-01 (v2.3: Fix Pylance static analysis errors)
 """
 
+from collections.abc import AsyncGenerator, AsyncIterable
 from datetime import UTC, datetime
 from typing import Any, Generic, TypeVar, cast
 
-from pydantic import BaseModel, ConfigDict, Field
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from starlette.responses import Response, StreamingResponse
 
 T = TypeVar("T")
 
 
+def _dump_success_envelope(data: Any, message: str, request_id: str | None) -> bytes:
+    """
+    辅助: orjson 序列化成功信封 (data 为最后一个字段，timestamp 以 Z 结尾)
+    """
+    return orjson.dumps(
+        {
+            "code": "success",
+            "message": message,
+            "request_id": request_id,
+            "timestamp": datetime.now(UTC),
+            "data": data,
+        },
+        option=orjson.OPT_UTC_Z,
+    )
+
+
 class ResponseBase(BaseModel):
     """
     响应基类
@@ -64,6 +83,74 @@ class ResponseModel(ResponseBase, Generic[T]):
             request_id=request_id,
         )
 
+    @staticmethod
+    def success_response(
+        data: Any = None,
+        *,
+        message: str = "Success",
+        request_id: str | None = None,
+        status_code: int = 200,
+    ) -> Response:
+        """
+        构造成功响应 (快速路径)
+        直接以 orjson 序列化信封并返回 Response，跳过模型构造、response_model 校验
+        与 jsonable_encoder；输出结构与 success() 一致 (timestamp 以 Z 结尾)。
+        适用于数据已是 JSON 原生类型、无需声明式校验的热点接口。
+        """
+        if hasattr(data, "model_dump"):
+            data = cast(Any, data).model_dump(mode="json")
+
+        return Response(
+            content=_dump_success_envelope(data, message, request_id),
+            status_code=status_code,
+            media_type="application/json",
+        )
+
+    @staticmethod
+    async def stream_list_response(
+        batches: AsyncIterable[list[T]],
+        items_adapter: TypeAdapter[list[T]],
+        *,
+        message: str = "Success",
+        request_id: str | None = None,
+    ) -> Response:
+        """
+        构造成功响应 (列表分批流式输出)
+        信封头部、各批列表项与尾部依次输出，长列表不会一次性载入内存。
+
+        在返回响应前预取至多两批：
+        - 取数阶段的异常 (如数据库错误) 照常抛出，由全局异常处理器返回标准错误信封
+        - 仅一批 (短列表，最常见) 时直接返回完整 Response，不进入流式
+        流式开始后若再出错，响应状态已发出，只能中断连接 (分块传输不完整，客户端可感知)。
+        """
+        # data 为信封最后一个字段: ...,"data":[]} -> 拆分为头部 + 列表项 + 尾部
+        head = _dump_success_envelope([], message, request_id).rpartition(b"[]")[0]
+        head += b"["
+        tail = b"]}"
+
+        iterator = aiter(batches)
+        prefetched: list[bytes] = []
+        async for items in iterator:
+            if items:
+                prefetched.append(items_adapter.dump_json(items)[1:-1])
+                if len(prefetched) == 2:
+                    break
+        else:
+            return Response(
+                content=head + b",".join(prefetched) + tail,
+                media_type="application/json",
+            )
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            yield head + prefetched[0]
+            yield b"," + prefetched[1]
+            async for items in iterator:
+                if items:
+                    yield b"," + items_adapter.dump_json(items)[1:-1]
+            yield tail
+
+        return StreamingResponse(body(), media_type="application/json")
+
     @classmethod
     def fail(
         cls,
@@ -6,18 +6,20 @@ Description: 安全工具模块 (Argon2id + JWT)
 1. 密码加密 (Hash): 使用 Argon2id 算法 (抗 GPU 破解)
 2. 密码验证 (Verify): 校验明文与哈希
 3. JWT 签发: 生成无状态的 Access Token
-4. 异步封装: 针对 CPU 密集型操作提供 async 支持
+4. 异步封装: 针对 CPU 密集型操作提供 async 支持 (专用线程池)
 
 Author: jinmozhe
 Created: 2025-12-05
 """
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
 from jose import jwt
 from pwdlib import PasswordHash
-from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
 
@@ -25,11 +27,27 @@ from app.core.config import settings
 # pwdlib[argon2] 默认使用 argon2 算法
 password_hash = PasswordHash.recommended()
 
+# 密码哈希专用线程池 (CPU 密集型，按核数限流，惰性创建)
+# 与 AnyIO 默认线程池 (同步端点/依赖共用) 隔离，注册高峰时不挤占普通请求的线程
+_hash_pool: ThreadPoolExecutor | None = None
+
 # ------------------------------------------------------------------------------
 # 1. 密码处理 (Password Hashing)
 # ------------------------------------------------------------------------------
 
 
+def get_hash_pool() -> ThreadPoolExecutor:
+    """
+    获取密码哈希线程池 (首次调用时创建，关闭后再次调用会重新创建)。
+    """
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1, thread_name_prefix="pwhash"
+        )
+    return _hash_pool
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     验证明文密码与哈希值是否匹配。
@@ -68,7 +86,10 @@ async def verify_password_async(plain_password: str, hashed_password: str) -> bo
     Returns:
         bool: 匹配返回 True，否则 False
     """
-    return await run_in_threadpool(verify_password, plain_password, hashed_password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_pool(), verify_password, plain_password, hashed_password
+    )
 
 
 async def get_password_hash_async(password: str) -> str:
@@ -81,7 +102,19 @@ async def get_password_hash_async(password: str) -> str:
     Returns:
         str: 加密后的哈希字符串
     """
-    return await run_in_threadpool(get_password_hash, password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_pool(), get_password_hash, password)
+
+
+def shutdown_hash_pool() -> None:
+    """
+    关闭密码哈希线程池 (应在应用 shutdown 时调用)。
+    关闭后重置为 None，同一进程内再次启动应用 (如测试) 时会重新创建。
+    """
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
 
 
 # ------------------------------------------------------------------------------
@@ -0,0 +1,147 @@
+"""
+File: app/core/static.py
+Description: 内存缓存的静态资源服务 (ReDoc 本地化资源等)
+
+本模块负责：
+1. 启动时一次性读取静态目录下的全部文件，预计算 ETag 与 gzip 压缩版本
+2. 请求时直接返回内存中的字节，不再经过线程池 stat/open/read
+3. 支持 If-None-Match 协商缓存 (304) 与按 Accept-Encoding 选择 gzip 版本
+
+注意：
+仅适用于体积小、部署后不变的资源 (文件变更需重启进程生效)。
+
+Author: jinmozhe
+Created: 2026-02-15
+"""
+
+import gzip
+import hashlib
+import mimetypes
+from dataclasses import dataclass
+from pathlib import Path
+
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+# 浏览器缓存策略: 文件名不含内容哈希，故不使用 immutable，过期后凭 ETag 重新验证
+_CACHE_CONTROL = "public, max-age=86400"
+
+# 小于该体积的文件不做压缩 (收益小于编码开销)
+_GZIP_MIN_SIZE = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class _StaticAsset:
+    """单个静态资源的预计算结果"""
+
+    body: bytes
+    gzip_body: bytes | None
+    media_type: str
+    etag: str
+
+
+def _load_asset(path: Path) -> _StaticAsset:
+    """
+    读取文件并预计算 ETag / gzip 版本 (仅在压缩后确实更小时保留)。
+    """
+    data = path.read_bytes()
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    gzip_body = None
+    if len(data) >= _GZIP_MIN_SIZE:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            gzip_body = compressed
+    etag = f'"{hashlib.blake2b(data, digest_size=8).hexdigest()}"'
+    return _StaticAsset(data, gzip_body, media_type, etag)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    解析 Accept-Encoding (逗号分隔的编码列表，可带 q 值)，判断是否接受 gzip。
+    q=0 表示明确拒绝；显式的 gzip 条目优先于通配符 *。
+    """
+    wildcard = False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        if name not in ("gzip", "x-gzip", "*"):
+            continue
+        accepted = True
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    accepted = float(value) > 0
+                except ValueError:
+                    accepted = False
+        if name != "*":
+            return accepted
+        wildcard = accepted
+    return wildcard
+
+
+class CachedStaticFiles:
+    """
+    内存缓存的静态文件 ASGI 应用，用法与 StaticFiles 一致:
+    app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        root = Path(directory)
+        self.assets: dict[str, _StaticAsset] = {
+            "/" + path.relative_to(root).as_posix(): _load_asset(path)
+            for path in root.rglob("*")
+            if path.is_file()
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+
+        if scope["method"] not in ("GET", "HEAD"):
+            response: Response = PlainTextResponse("Method Not Allowed", 405)
+            await response(scope, receive, send)
+            return
+
+        asset = self.assets.get(self._route_path(scope))
+        if asset is None:
+            await PlainTextResponse("Not Found", 404)(scope, receive, send)
+            return
+
+        headers = {
+            "ETag": asset.etag,
+            "Cache-Control": _CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        request_headers = dict(scope["headers"])
+
+        # 协商缓存命中: 直接 304
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        if asset.etag in (
+            c.strip().removeprefix("W/") for c in if_none_match.split(",")
+        ):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        body = asset.body
+        accept_encoding = request_headers.get(b"accept-encoding", b"").decode("latin-1")
+        if asset.gzip_body is not None and _accepts_gzip(accept_encoding):
+            body = asset.gzip_body
+            headers["Content-Encoding"] = "gzip"
+
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+
+        response = Response(body, headers=headers, media_type=asset.media_type)
+        await response(scope, receive, send)
+
+    @staticmethod
+    def _route_path(scope: Scope) -> str:
+        """
+        辅助: 去除挂载前缀 (root_path)，得到相对于静态目录的路径。
+        """
+        path: str = scope["path"]
+        root_path: str = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            return path[len(root_path) :]
+        return path
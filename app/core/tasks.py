@@ -0,0 +1,165 @@
+"""
+File: app/core/tasks.py
+Description: 后台任务调度工具 (Fire-and-Forget)
+
+本模块负责：
+1. 在当前事件循环中调度不阻塞请求链路的后台协程 (如 SSE 结束后的落库)
+2. 持有任务的强引用，防止任务在执行完成前被 GC 回收
+3. 统一记录后台任务中未捕获的异常
+4. QAStatusTracker: 流式问答的状态回写 (GENERATING -> COMPLETED / FAILED)
+
+注意：
+后台任务的生命周期独立于请求，严禁在其中复用请求级 AsyncSession，
+应通过 AsyncSessionLocal 自行创建短生命周期会话。
+
+Author: jinmozhe
+Created: 2026-02-14
+"""
+
+import asyncio
+from collections.abc import Callable, Coroutine
+from typing import Any, Protocol
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+
+# asyncio 只保存任务的弱引用，必须在此持有强引用直到任务结束
+_background_tasks: set[asyncio.Task[Any]] = set()
+
+
+def _on_task_done(task: asyncio.Task[Any]) -> None:
+    """
+    任务结束回调：释放引用并记录未处理的异常。
+    """
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.opt(exception=exc).error(
+            f"Background task {task.get_name()} failed with unhandled exception"
+        )
+
+
+def spawn_background(
+    coro: Coroutine[Any, Any, Any], *, name: str | None = None
+) -> asyncio.Task[Any]:
+    """
+    调度一个后台协程 (不等待其完成)。
+
+    Args:
+        coro: 待执行的协程对象
+        name: 任务名称 (便于日志排查)
+
+    Returns:
+        asyncio.Task: 已调度的任务，调用方可按需 await 以建立先后依赖
+    """
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+class QAStatusRepository(Protocol):
+    """
+    状态回写所需的 QA 仓储接口 (各领域 QA 仓储均满足)。
+    """
+
+    session: AsyncSession
+
+    async def update_status(self, qa_id: UUID, status: str) -> Any: ...
+
+
+class QAStatusTracker:
+    """
+    流式问答的状态回写 (GENERATING -> COMPLETED / FAILED)。
+
+    - start: 后台写入 GENERATING，不阻塞 LLM 调用
+    - 之后的状态写入均先等待 generating 任务，保证 GENERATING 不会覆盖终态
+    - 生成器退出时在 finally 中调用 close()：未写入终态 (客户端断开 / 错误帧发送中断开)
+      时请求会话随之关闭，且当前作用域内无法再 await，改由独立会话在后台回写 FAILED
+    """
+
+    def __init__(
+        self,
+        repo_cls: Callable[[AsyncSession], QAStatusRepository],
+        qa_id: UUID,
+        generating: asyncio.Task[None],
+        name: str,
+    ) -> None:
+        self.repo_cls = repo_cls
+        self.qa_id = qa_id
+        self.generating = generating
+        self.name = name
+        # 是否已写入 (或已交由后台任务写入) 终态 COMPLETED / FAILED
+        self.settled = False
+
+    @classmethod
+    def start(
+        cls,
+        repo_cls: Callable[[AsyncSession], QAStatusRepository],
+        qa_id: UUID,
+        *,
+        name: str,
+    ) -> "QAStatusTracker":
+        """
+        后台写入 GENERATING 并返回跟踪器。
+
+        Args:
+            repo_cls: QA 仓储类 (以会话构造)，后台写入时绑定独立会话
+            qa_id: 问答记录 ID
+            name: 任务名前缀 (通常为领域名，便于日志排查)
+        """
+        generating = spawn_background(
+            cls._write(repo_cls, qa_id, "GENERATING"), name=f"{name}-status-{qa_id}"
+        )
+        return cls(repo_cls, qa_id, generating, name)
+
+    @staticmethod
+    async def _write(
+        repo_cls: Callable[[AsyncSession], QAStatusRepository],
+        qa_id: UUID,
+        status: str,
+    ) -> None:
+        """
+        使用独立短生命周期会话更新状态 (不与请求会话跨任务共享)。
+        """
+        try:
+            async with AsyncSessionLocal() as session:
+                await repo_cls(session).update_status(qa_id, status)
+                await session.commit()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Failed to set status={status} for qa_id={qa_id}: {e}")
+
+    async def set_status(self, status: str) -> None:
+        """
+        等待 GENERATING 写入后，经独立会话更新状态 (用于后台任务)。
+        """
+        await self.generating
+        await self._write(self.repo_cls, self.qa_id, status)
+
+    async def fail(self, repo: QAStatusRepository) -> None:
+        """
+        在请求会话内回写 FAILED 并标记终态 (用于错误帧发送之后)。
+        """
+        await self.generating
+        try:
+            await repo.update_status(self.qa_id, "FAILED")
+            await repo.session.commit()
+        except Exception as db_e:  # noqa: BLE001
+            logger.error(f"Failed to update DB status for qa_id={self.qa_id}: {db_e}")
+        self.settled = True
+
+    def close(self) -> None:
+        """
+        生成器退出时调用：未写入终态则在后台回写 FAILED。
+        """
+        if self.settled:
+            return
+        self.settled = True
+        spawn_background(
+            self.set_status("FAILED"), name=f"{self.name}-failed-{self.qa_id}"
+        )
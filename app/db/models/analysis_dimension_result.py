@@ -25,7 +25,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 from app.db.models.base import Base
 
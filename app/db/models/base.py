@@ -20,7 +20,7 @@ from typing import Any
 from sqlalchemy import Boolean, DateTime, MetaData, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, declared_attr, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 # PostgreSQL 约束命名约定
 POSTGRES_INDEXES_NAMING_CONVENTION = {
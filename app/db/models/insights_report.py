@@ -24,7 +24,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 # 1. 直接引用底层 Base
 from app.db.models.base import Base
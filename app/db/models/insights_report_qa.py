@@ -15,7 +15,7 @@ from datetime import datetime
 from sqlalchemy import CheckConstraint, DateTime, Index, String, Text, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 # 1. 直接引用底层 Base
 from app.db.models.base import Base
@@ -23,10 +23,11 @@ from sqlalchemy import (
     String,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 # 1. 直接引用底层 Base
 from app.db.models.base import Base
@@ -186,5 +187,22 @@ class MarketingReport(Base):
             "ad_type",  # 加入常用查询索引
             "report_type",
         ),
+        # [Perf] 覆盖索引: 支撑 get_flat_reports (按用户/站点过滤，period_start 倒序)
+        # INCLUDE 列表覆盖列表接口的全部投影列，查询可走 Index Only Scan，无需回表
+        Index(
+            "ix_mk_report_user_mkt_pstart",
+            "user_id",
+            "marketplace_id",
+            text("period_start DESC"),
+            postgresql_include=[
+                "period_end",
+                "report_type",
+                "report_source",
+                "pdf_path",
+                "id",
+                "week",
+                "ad_type",
+            ],
+        ),
         {"comment": "营销报告表 - 存储用户维度的广告周期性诊断数据"},
     )
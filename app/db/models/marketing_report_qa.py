@@ -11,7 +11,7 @@ from datetime import datetime
 from sqlalchemy import CheckConstraint, DateTime, Index, String, Text, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 from app.db.models.base import Base
 
@@ -112,10 +112,20 @@ class MarketingReportQA(Base):
         ),
         CheckConstraint("length(trim(question)) > 0", name="ck_mk_qa_question_valid"),
         # ----- Indexes -----
+        # [Perf] INCLUDE status: 仅需时间轴 + 状态的扫描可走 Index Only Scan
+        # question/answer 为不定长大文本，不纳入索引 (避免索引膨胀与超长索引元组)
         Index(
             "ix_mk_qa_report_timeline",
             "report_id",
             "created_at",
+            postgresql_include=["status"],
+        ),
+        # [Perf] 支撑 get_recent_history: 按报告过滤已完成记录，created_at 倒序取最近 N 条
+        Index(
+            "ix_mk_qa_report_recent",
+            "report_id",
+            "status",
+            text("created_at DESC"),
         ),
         {"comment": "报告分析问答表 - 存储基于报告的多轮对话记录"},
     )
@@ -29,7 +29,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from uuid6 import uuid7
+from uuid_utils.compat import uuid7
 
 from app.db.models.base import Base
 
@@ -201,6 +201,22 @@ class OperationsReport(Base):
             "period_start",
             "ad_type",
         ),
+        # 列表接口窗口函数查询的覆盖索引 (按周期倒序，INCLUDE 投影列，避免回表)
+        Index(
+            "ix_ops_report_user_mkt_period",
+            "user_id",
+            "marketplace_id",
+            text("period_start DESC"),
+            text("period_end DESC"),
+            postgresql_include=[
+                "id",
+                "week",
+                "ad_type",
+                "report_type",
+                "report_source",
+                "pdf_path",
+            ],
+        ),
         {"comment": "运营报告主表 - 存储KPI及诊断看板"},
     )
 
@@ -272,7 +288,8 @@ class OperationsChangeLog(Base):
             "period_start",
             "period_end",
             "category",
-            "created_at",
+            text("created_at DESC"),
+            text("id DESC"),  # Keyset 分页的稳定排序键
         ),
         {"comment": "运营三维变化明细表"},
     )
@@ -343,7 +360,8 @@ class OperationsAuditLog(Base):
             "period_start",
             "period_end",
             "category",
-            "created_at",
+            text("created_at DESC"),
+            text("id DESC"),  # Keyset 分页的稳定排序键
         ),
         {"comment": "运营操作审计日志表"},
     )
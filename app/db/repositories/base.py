@@ -4,6 +4,7 @@ Description: 通用异步 Repository 基类 (CRUD)
 
 本模块定义了 BaseRepository，封装了通用的 CRUD 操作。
 所有领域的 Repository 应继承此类，以减少样板代码。
+仅做自定义查询的仓储可继承更轻量的 QueryRepository。
 
 特性：
 - 泛型支持: BaseRepository[ModelType, CreateSchemaType, UpdateSchemaType]
@@ -14,6 +15,7 @@ Author: jinmozhe
 Created: 2025-11-25
 """
 
+from collections.abc import Sequence
 from typing import Any, ClassVar, Generic, TypeVar
 
 from pydantic import BaseModel
@@ -28,6 +30,20 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+class QueryRepository:
+    """
+    轻量查询仓储基类 (无模型绑定，不含通用 CRUD)。
+
+    适用于仅包含自定义查询/语句的领域仓储 (如报告列表、问答记录)，
+    构造时只需注入 AsyncSession，无需 model=None 之类的占位参数。
+    """
+
+    __slots__ = ("session",)
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     通用 CRUD 仓储基类。
@@ -71,7 +87,7 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         *,
         skip: int = 0,
         limit: int = 100,
-    ) -> list[ModelType]:
+    ) -> Sequence[ModelType]:
         """
         分页查询记录列表。
 
@@ -80,11 +96,11 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             limit: 返回的最大记录数
 
         Returns:
-            list[ModelType]: 记录列表
+            Sequence[ModelType]: 记录列表
         """
         stmt = select(self.model).offset(skip).limit(limit)
         result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return result.scalars().all()
 
     async def count(self) -> int:
         """
@@ -4,7 +4,7 @@ Description: 数据库会话管理 (Async SQLAlchemy)
 
 本模块负责：
 1. 创建全局唯一的 AsyncEngine (基于 postgresql+asyncpg)
-2. 配置连接池参数 (pool_pre_ping, pool_size 等)，从 Settings 读取
+2. 配置连接池与语句缓存参数 (pool_pre_ping, pool_size 等)，从 Settings 读取
 3. 创建 AsyncSession 工厂 (AsyncSessionLocal)
 4. 集成 orjson 用于高性能 JSON 字段序列化
 5. 提供引擎关闭函数用于优雅退出
@@ -53,10 +53,18 @@ engine: AsyncEngine = create_async_engine(
     max_overflow=settings.DB_MAX_OVERFLOW,
     pool_timeout=settings.DB_POOL_TIMEOUT,
     pool_recycle=settings.DB_POOL_RECYCLE,
+    # 编译语句缓存 (默认 500，接口较多时调大以减少重复编译)
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
     # 高性能 JSON 序列化配置
     json_serializer=_orjson_serializer,
     json_deserializer=_orjson_deserializer,
-    connect_args={"ssl": False},  # 根据需要配置 SSL 连接参数
+    connect_args={
+        "ssl": False,  # 根据需要配置 SSL 连接参数
+        # 每连接的预编译语句缓存: asyncpg 驱动层 + SQLAlchemy 适配层
+        # 热点查询 (问答状态/历史/上下文) 复用 prepared statement，省去重复 PARSE
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    },
 )
 
 # 2. 创建异步会话工厂
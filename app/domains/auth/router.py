@@ -28,7 +28,6 @@ from app.core.redis import get_redis
 
 # [变更] 仅导入 ResponseModel，移除 success 辅助函数
 from app.core.response import ResponseModel
-from app.db.models.user import User
 
 # [变更] 导入领域消息常量
 from app.domains.auth.constants import AuthMsg
@@ -52,7 +51,7 @@ async def get_auth_service(
     自动注入数据库会话 (Session) 和 Redis 客户端。
     """
     # 复用 User 领域的 Repository
-    user_repo = UserRepository(model=User, session=session)
+    user_repo = UserRepository(session=session)
     return AuthService(user_repo=user_repo, redis=redis)
 
 
@@ -44,7 +44,7 @@ class LoginRequest(BaseModel):
     @classmethod
     def validate_e164(cls, v: str) -> str:
         """验证手机号格式"""
-        if not E164_PATTERN.match(v):
+        if E164_PATTERN.fullmatch(v) is None:
             raise ValueError(E164_ERROR_MESSAGE)
         return v
 
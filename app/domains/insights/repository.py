@@ -11,17 +11,76 @@ Created: 2026-02-08
 Updated: 2026-02-10 (Implement Top-4 Periods Logic via CTE)
 """
 
+from collections.abc import Sequence
+from functools import lru_cache
 from uuid import UUID
 
 from pydantic import BaseModel
-from sqlalchemy import asc, desc, select, update
-from sqlalchemy.orm import load_only
+from sqlalchemy import (
+    Integer,
+    Select,
+    asc,
+    bindparam,
+    desc,
+    exists,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.db.models.insights_report import InsightsReport
 from app.db.models.insights_report_qa import InsightsReportQA
 from app.db.repositories.base import BaseRepository
 
 
+@lru_cache(maxsize=1)
+def _flat_reports_stmt() -> Select:
+    """
+    构建 get_flat_reports 的查询语句 (仅构建一次)。
+    所有过滤条件均为 bindparam，语句结构稳定，编译结果可被引擎缓存复用。
+    """
+    # 1. 定义 CTE：找出最近的 N 个唯一周期
+    target_periods_cte = (
+        select(InsightsReport.period_start, InsightsReport.period_end)
+        .where(
+            InsightsReport.user_id == bindparam("user_id"),
+            InsightsReport.marketplace_id == bindparam("marketplace_id"),
+        )
+        .group_by(InsightsReport.period_start, InsightsReport.period_end)  # 去重
+        .order_by(desc(InsightsReport.period_start))  # 倒序
+        .limit(bindparam("period_limit", type_=Integer))  # 限制周期数量 (默认4)
+        .cte("target_periods")
+    )
+
+    # 2. 主查询：Inner Join 这个 CTE (列投影，结果以 mapping 形式返回，无需构建 ORM 实例)
+    stmt = (
+        select(
+            InsightsReport.id,
+            InsightsReport.week,
+            InsightsReport.ad_type,
+            InsightsReport.period_start,
+            InsightsReport.period_end,
+            InsightsReport.report_type,
+            InsightsReport.report_source,
+            InsightsReport.pdf_path,
+        )
+        .join(
+            target_periods_cte,
+            (InsightsReport.period_start == target_periods_cte.c.period_start)
+            & (InsightsReport.period_end == target_periods_cte.c.period_end),
+        )
+        .where(
+            InsightsReport.user_id == bindparam("user_id"),
+            InsightsReport.marketplace_id == bindparam("marketplace_id"),
+        )
+        .order_by(desc(InsightsReport.period_start))
+    )
+    return stmt
+
+
 class InsightsReportRepository(BaseRepository[InsightsReport, BaseModel, BaseModel]):
     """
     洞察报告仓储
@@ -29,58 +88,24 @@ class InsightsReportRepository(BaseRepository[InsightsReport, BaseModel, BaseMod
 
     async def get_flat_reports(
         self, user_id: str, marketplace_id: str, period_limit: int = 4
-    ) -> list[InsightsReport]:
+    ) -> Sequence[RowMapping]:
         """
-        获取用户最近的报告列表 (元数据)。
+        获取用户最近的报告列表 (元数据，列投影，返回 dict-like 行)。
 
         [Business Rule] 永远只返回最近的 N 个周期(Period)的数据。
         逻辑：
         1. 先找出最近的 period_limit 个唯一周期 (Start/End)。
         2. 再查找属于这些周期的所有报告记录。
         """
-
-        # 1. 定义 CTE：找出最近的 N 个唯一周期
-        target_periods_cte = (
-            select(InsightsReport.period_start, InsightsReport.period_end)
-            .where(
-                InsightsReport.user_id == user_id,
-                InsightsReport.marketplace_id == marketplace_id,
-            )
-            .group_by(InsightsReport.period_start, InsightsReport.period_end)  # 去重
-            .order_by(desc(InsightsReport.period_start))  # 倒序
-            .limit(period_limit)  # 限制周期数量 (默认4)
-            .cte("target_periods")
-        )
-
-        # 2. 主查询：Inner Join 这个 CTE
-        stmt = (
-            select(InsightsReport)
-            .options(
-                load_only(
-                    InsightsReport.id,
-                    InsightsReport.week,
-                    InsightsReport.ad_type,
-                    InsightsReport.period_start,
-                    InsightsReport.period_end,
-                    InsightsReport.report_type,
-                    InsightsReport.report_source,
-                    InsightsReport.pdf_path,
-                )
-            )
-            .join(
-                target_periods_cte,
-                (InsightsReport.period_start == target_periods_cte.c.period_start)
-                & (InsightsReport.period_end == target_periods_cte.c.period_end),
-            )
-            .where(
-                InsightsReport.user_id == user_id,
-                InsightsReport.marketplace_id == marketplace_id,
-            )
-            .order_by(desc(InsightsReport.period_start))
+        result = await self.session.execute(
+            _flat_reports_stmt(),
+            {
+                "user_id": user_id,
+                "marketplace_id": marketplace_id,
+                "period_limit": period_limit,
+            },
         )
-
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return result.mappings().all()
 
     async def get_latest_report(
         self,
@@ -114,40 +139,62 @@ class InsightsQARepository(BaseRepository[InsightsReportQA, BaseModel, BaseModel
     洞察问答仓储
     """
 
-    async def get_report_context(self, report_id: UUID) -> dict | None:
-        """
-        [RAG Core] 获取 RAG 所需的上下文数据。
+    def __init__(self, session: AsyncSession):
+        # 模型固定为 InsightsReportQA，调用方只需注入会话 (便于后台任务以独立会话构造)
+        super().__init__(model=InsightsReportQA, session=session)
 
-        [Updated] 仅返回 mcp_data 字段值，作为 AI 分析的核心依据。
+    async def get_qa_with_context(
+        self, qa_id: UUID
+    ) -> tuple[InsightsReportQA | None, dict | None]:
         """
-        stmt = select(InsightsReport.mcp_data).where(InsightsReport.id == report_id)
+        [RAG Core] 单次查询同时获取问答记录及其报告上下文 (mcp_data)。
+        使用 LEFT JOIN，报告缺失时仍可区分 "会话不存在" 与 "上下文缺失"。
+        """
+        stmt = (
+            select(InsightsReportQA, InsightsReport.mcp_data)
+            .outerjoin(InsightsReport, InsightsReport.id == InsightsReportQA.report_id)
+            .where(InsightsReportQA.id == qa_id)
+        )
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        row = result.one_or_none()
+        if row is None:
+            return None, None
+        return row[0], row[1]
 
-    async def get_qa_by_id(self, qa_id: UUID) -> InsightsReportQA | None:
+    async def has_report_context(self, report_id: UUID) -> bool:
         """
-        获取单条问答记录。
+        [Fail Fast] 仅判断报告是否存在可用的 mcp_data (EXISTS，不传输 JSONB 大字段)。
         """
-        stmt = select(InsightsReportQA).where(InsightsReportQA.id == qa_id)
+        stmt = select(
+            exists().where(
+                InsightsReport.id == report_id,
+                InsightsReport.mcp_data.is_not(None),
+            )
+        )
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        return bool(result.scalar())
 
     async def create_qa_record(
         self, user_id: str, marketplace_id: str, report_id: UUID, question: str
-    ) -> InsightsReportQA:
+    ) -> UUID:
         """
         创建一条初始状态(PENDING)的问答记录。
+        使用 INSERT ... RETURNING 在一次往返中拿到主键，无需 refresh。
         """
-        qa_record = InsightsReportQA(
-            user_id=user_id,
-            marketplace_id=marketplace_id,
-            report_id=report_id,
-            question=question,
-            status="PENDING",
-            answer=None,
+        stmt = (
+            insert(InsightsReportQA)
+            .values(
+                user_id=user_id,
+                marketplace_id=marketplace_id,
+                report_id=report_id,
+                question=question,
+                status="PENDING",
+                answer=None,
+            )
+            .returning(InsightsReportQA.id)
         )
-        self.session.add(qa_record)
-        return qa_record
+        result = await self.session.execute(stmt)
+        return result.scalar_one()
 
     async def update_status(self, qa_id: UUID, status: str) -> None:
         """
@@ -173,7 +220,7 @@ class InsightsQARepository(BaseRepository[InsightsReportQA, BaseModel, BaseModel
 
     async def get_chat_history(
         self, user_id: str, marketplace_id: str, report_id: UUID
-    ) -> list[InsightsReportQA]:
+    ) -> Sequence[InsightsReportQA]:
         """
         获取指定报告的对话历史，按时间正序排列。
         """
@@ -187,16 +234,17 @@ class InsightsQARepository(BaseRepository[InsightsReportQA, BaseModel, BaseModel
             .order_by(asc(InsightsReportQA.created_at))
         )
         result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return result.scalars().all()
 
     async def get_recent_history(
         self, report_id: UUID, current_qa_id: UUID, limit: int = 5
-    ) -> list[InsightsReportQA]:
+    ) -> Sequence[InsightsReportQA]:
         """
         [RAG Context] 获取当前对话之前的最近 N 条历史记录。
         用于构建 LLM 的 Multi-turn Context。
         """
-        stmt = (
+        # 内层：倒序取最近 N 条；外层：按时间正序返回 (旧 -> 新)，符合 LLM 阅读习惯
+        inner = (
             select(InsightsReportQA)
             .where(
                 InsightsReportQA.report_id == report_id,
@@ -206,7 +254,9 @@ class InsightsQARepository(BaseRepository[InsightsReportQA, BaseModel, BaseModel
             )
             .order_by(desc(InsightsReportQA.created_at))  # 倒序取最近的
             .limit(limit)
+            .subquery()
         )
+        recent_qa = aliased(InsightsReportQA, inner)
+        stmt = select(recent_qa).order_by(asc(inner.c.created_at))
         result = await self.session.execute(stmt)
-        # 翻转为正序 (时间轴: 旧 -> 新)，符合 LLM 阅读习惯
-        return list(reversed(list(result.scalars().all())))
+        return result.scalars().all()
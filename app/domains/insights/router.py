@@ -44,7 +44,7 @@ async def get_insights_service(session: DBSession) -> InsightsReportService:
 
 
 async def get_qa_service(session: DBSession) -> InsightsQAService:
-    repo = InsightsQARepository(model=None, session=session)  # type: ignore
+    repo = InsightsQARepository(session)
     return InsightsQAService(repo)
 
 
@@ -142,6 +142,8 @@ async def stream_chat_answer(
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            # 禁止中间件对流式响应做压缩，保证逐帧直达客户端
+            "Content-Encoding": "identity",
         },
     )
 
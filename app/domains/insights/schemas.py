@@ -7,6 +7,8 @@ Description: 洞察领域 Pydantic 模型
 2. 最新报告详情查询 (LatestReportResponse - 含 ID 和 大字段)
 3. 智能问答交互 (ChatInitRequest, ChatRecordItem)
 
+注意: 响应模型 (ORM -> 出参) 均为只读: frozen=True 禁止构建后修改，extra="ignore" 忽略多余字段。
+
 Author: jinmozhe
 Created: 2026-02-08
 Updated: 2026-02-09
@@ -47,7 +49,7 @@ class InsightsReportItem(BaseModel):
     report_source: str = Field(..., description="报告来源")
     pdf_path: str | None = Field(default=None, description="PDF文件路径")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 # ==============================================================================
@@ -86,7 +88,7 @@ class LatestReportResponse(BaseModel):
     insights: dict[str, Any] = Field(..., description="洞察结论")
     ai: dict[str, Any] = Field(..., description="AI 分析建议")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 # ==============================================================================
@@ -134,4 +136,4 @@ class ChatRecordItem(BaseModel):
     status: str = Field(..., description="状态: PENDING/GENERATING/COMPLETED/FAILED")
     created_at: datetime = Field(..., description="提问时间")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
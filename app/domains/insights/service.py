@@ -8,19 +8,27 @@ Description: 洞察领域服务层
 
 Author: jinmozhe
 Created: 2026-02-08
-Updated: 2026-02-10 (Fix limit -> period_limit for Top-4 Periods)
+Updated: 2026-02-14 (Persist final answer in background before [DONE])
 """
 
-import json
+import asyncio
 from collections.abc import AsyncGenerator
+from io import StringIO
 from uuid import UUID
 
+import httpx
+import orjson
+from cachetools import TTLCache
 from loguru import logger
-from openai import APIError, AsyncOpenAI
+from openai import APIError
 from openai.types.chat import ChatCompletionMessageParam
+from pydantic import TypeAdapter
 
 from app.core.config import settings
 from app.core.exceptions import AppException
+from app.core.llm import get_llm_client, trim_history
+from app.core.tasks import QAStatusTracker, spawn_background
+from app.db.session import AsyncSessionLocal
 from app.domains.insights.constants import InsightsErrorCode
 from app.domains.insights.repository import (
     InsightsQARepository,
@@ -36,6 +44,27 @@ from app.domains.insights.schemas import (
     LatestReportResponse,
 )
 
+# 列表校验器 (模块级构建一次)
+_REPORT_ITEMS_ADAPTER = TypeAdapter(list[InsightsReportItem])
+
+# 报告上下文存在性缓存 (report_id -> True)，mcp_data 写入后基本不变，短 TTL 即可
+_REPORT_CONTEXT_EXISTS: TTLCache[UUID, bool] = TTLCache(maxsize=1024, ttl=60)
+
+# SSE 合帧策略：累计到 4KB 或首帧待发超过 20ms 即刷出 (定时器驱动)，摊薄逐 Token 发送开销
+_SSE_FLUSH_BYTES = 4096
+_SSE_FLUSH_INTERVAL = 0.02
+
+# RAG 系统提示词 (模块级常量，避免每次请求重复拼接)
+_SYSTEM_PROMPT = """你是一个专业的广告营销数据分析师。请根据提供的 JSON 数据（MCP 洞察报告）回答用户的问题。
+要求：
+1. 引用具体数据支持你的观点。
+2. 回答风格专业、客观、简洁。
+3. 使用 Markdown 格式。
+4. 如果数据中没有相关信息，请明确说明，不要编造。"""
+
+# 预拼接的系统消息前缀 (每次请求仅需一次字符串拼接)
+_SYSTEM_PROMPT_PREFIX = _SYSTEM_PROMPT + "\n\n数据:\n"
+
 
 class InsightsReportService:
     def __init__(self, repo: InsightsReportRepository):
@@ -49,7 +78,8 @@ class InsightsReportService:
         """
         # [Updated] 使用 period_limit=4 获取最近的4个周期数据
         rows = await self.repo.get_flat_reports(user_id, marketplace_id, period_limit=4)
-        return [InsightsReportItem.model_validate(row) for row in rows]
+        # 行已是 dict-like mapping，整表单次校验，跳过 from_attributes 的逐字段 getattr
+        return _REPORT_ITEMS_ADAPTER.validate_python(rows)
 
     async def get_latest_report(
         self, req: LatestReportRequest
@@ -76,26 +106,22 @@ class InsightsQAService:
 
     def __init__(self, repo: InsightsQARepository):
         self.repo = repo
-        # 初始化 LLM 客户端
-        self.llm_client = AsyncOpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL,
-            timeout=60.0,
-            max_retries=2,
-        )
+        # 复用全局 LLM 客户端 (共享连接池)
+        self.llm_client = get_llm_client()
 
     async def init_chat(self, req: ChatInitRequest) -> ChatInitResponse:
         """
         第一步：初始化对话
         """
         # 1. 校验报告是否存在 (Fail Fast)
-        # 仅检查是否存在 mcp_data
-        mcp_data = await self.repo.get_report_context(req.report_id)
-        if not mcp_data:
-            raise AppException(InsightsErrorCode.REPORT_CONTEXT_MISSING)
-
-        # 2. 创建 QA 记录 (PENDING)
-        qa_record = await self.repo.create_qa_record(
+        # 仅检查是否存在 mcp_data (EXISTS + 进程内短期缓存，仅缓存命中结果)
+        if req.report_id not in _REPORT_CONTEXT_EXISTS:
+            if not await self.repo.has_report_context(req.report_id):
+                raise AppException(InsightsErrorCode.REPORT_CONTEXT_MISSING)
+            _REPORT_CONTEXT_EXISTS[req.report_id] = True
+
+        # 2. 创建 QA 记录 (PENDING)，INSERT ... RETURNING 直接拿到 ID
+        qa_id = await self.repo.create_qa_record(
             user_id=req.user_id,
             marketplace_id=req.marketplace_id,
             report_id=req.report_id,
@@ -104,47 +130,36 @@ class InsightsQAService:
 
         # 3. 提交事务
         await self.repo.session.commit()
-        await self.repo.session.refresh(qa_record)
 
-        return ChatInitResponse(qa_id=qa_record.id)
+        return ChatInitResponse(qa_id=qa_id)
 
-    async def stream_answer_generator(self, qa_id: UUID) -> AsyncGenerator[str, None]:
+    async def stream_answer_generator(self, qa_id: UUID) -> AsyncGenerator[bytes, None]:
         """
         第二步：流式生成答案 (Async Generator)
+        输出为已编码的 SSE 字节帧，多个 Token 帧会合并后批量发送。
         """
-        # 1. 获取 QA 记录
-        qa_record = await self.repo.get_qa_by_id(qa_id)
+        # 1. 获取 QA 记录 + 上下文 (mcp_data Only)，单次 JOIN 查询
+        qa_record, mcp_data = await self.repo.get_qa_with_context(qa_id)
         if not qa_record:
-            yield "data: [ERROR] Session not found\n\n"
+            yield b"data: [ERROR] Session not found\n\n"
             return
 
-        # 2. 获取上下文 (mcp_data Only)
-        mcp_data = await self.repo.get_report_context(qa_record.report_id)
+        # 2. 校验上下文
         if not mcp_data:
-            yield "data: [ERROR] Report context data missing\n\n"
+            yield b"data: [ERROR] Report context data missing\n\n"
             return
 
-        # 3. 更新状态: GENERATING
-        await self.repo.update_status(qa_id, "GENERATING")
-        await self.repo.session.commit()
+        # 3. 更新状态: GENERATING (后台提交，不阻塞 LLM 调用)
+        # 最终状态回写会先等待该任务完成，保证 GENERATING 不会覆盖终态
+        status = QAStatusTracker.start(InsightsQARepository, qa_id, name="insights")
 
         # 4. 构建 System Prompt
-        # 直接序列化 mcp_data
-        context_str = json.dumps(mcp_data, ensure_ascii=False)
-
-        system_prompt = (
-            "你是一个专业的广告营销数据分析师。请根据提供的 JSON 数据（MCP 洞察报告）"
-            "回答用户的问题。\n"
-            "要求：\n"
-            "1. 引用具体数据支持你的观点。\n"
-            "2. 回答风格专业、客观、简洁。\n"
-            "3. 使用 Markdown 格式。\n"
-            "4. 如果数据中没有相关信息，请明确说明，不要编造。"
-        )
+        # orjson 原生输出 UTF-8 (等价 ensure_ascii=False)，大文档序列化远快于标准库
+        context_str = orjson.dumps(mcp_data).decode("utf-8")
 
-        # A. 基础系统消息
+        # A. 基础系统消息 (提示词为模块常量)
         messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": f"{system_prompt}\n\n数据:\n{context_str}"}
+            {"role": "system", "content": _SYSTEM_PROMPT_PREFIX + context_str}
         ]
 
         # B. 注入历史记录 (Sliding Window Strategy)
@@ -155,17 +170,31 @@ class InsightsQAService:
             limit=5,
         )
 
-        for record in history_records:
-            if record.question and record.answer:
-                # 必须按 User -> Assistant 顺序配对
-                messages.append({"role": "user", "content": record.question})
-                # [Critical] R1 模型优化: 仅注入最终 Answer，不注入 CoT (Reasoning)，保持上下文纯净
-                messages.append({"role": "assistant", "content": record.answer})
+        # 必须按 User -> Assistant 顺序配对，一次 extend 批量写入
+        # [Critical] R1 模型优化: 仅注入最终 Answer，不注入 CoT (Reasoning)，保持上下文纯净
+        # 按 Token 预算裁剪，优先保留最近轮次
+        history = trim_history(
+            ((record.question, record.answer) for record in history_records),
+            settings.LLM_HISTORY_TOKEN_BUDGET,
+        )
+        messages.extend(
+            msg
+            for question, answer in history
+            for msg in (
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            )
+        )
 
         # C. 追加当前用户问题
         messages.append({"role": "user", "content": qa_record.question})
 
-        full_answer_buffer = []
+        # 上下文已全部取出: 结束只读事务并归还连接，LLM 流式生成期间不占用连接池
+        # (答案由独立会话后台落库，失败回写时本会话会重新签出连接)
+        await self.repo.session.close()
+
+        # 完整回答累积 (StringIO 就地追加，结束时一次性取值)
+        answer_buf = StringIO()
 
         try:
             # 5. 调用 LLM
@@ -176,41 +205,98 @@ class InsightsQAService:
                 temperature=0.3,
             )
 
-            async for chunk in stream:
-                delta = chunk.choices[0].delta
-                content = delta.content
-
-                if content:
-                    full_answer_buffer.append(content)
-                    # SSE 格式推送
-                    yield f"data: {json.dumps({'content': content}, ensure_ascii=False)}\n\n"
+            # 逐块拉取并合帧推送 (每个 SSE 事件自带 \n\n 结尾，合帧不破坏协议)：
+            # 待发字节满 _SSE_FLUSH_BYTES，或首帧待发超过 _SSE_FLUSH_INTERVAL
+            # (由等待超时触发，LLM 停顿时同样生效) 即刷出
+            loop = asyncio.get_running_loop()
+            pending = bytearray()
+            pending_since = 0.0
+            chunks = aiter(stream)
+            next_chunk = asyncio.ensure_future(anext(chunks))
+            try:
+                while True:
+                    timeout = None
+                    if pending:
+                        timeout = max(
+                            pending_since + _SSE_FLUSH_INTERVAL - loop.time(), 0
+                        )
+                    done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+                    if not done:
+                        yield bytes(pending)
+                        pending.clear()
+                        continue
+                    try:
+                        chunk = next_chunk.result()
+                    except StopAsyncIteration:
+                        break
+                    next_chunk = asyncio.ensure_future(anext(chunks))
+
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        answer_buf.write(content)
+                        if not pending:
+                            pending_since = loop.time()
+                        pending += (
+                            b"data: " + orjson.dumps({"content": content}) + b"\n\n"
+                        )
+                        if len(pending) >= _SSE_FLUSH_BYTES:
+                            yield bytes(pending)
+                            pending.clear()
+
+                # 刷出剩余帧
+                if pending:
+                    yield bytes(pending)
+            finally:
+                # 客户端断开或异常退出时，取消尚未完成的拉取
+                next_chunk.cancel()
+
+            # 6. [闭环] 更新数据库 (后台落库，不阻塞 [DONE] 信号)
+            spawn_background(
+                self._persist_answer(status, answer_buf.getvalue()),
+                name=f"insights-persist-{qa_id}",
+            )
+            status.settled = True
 
-            # 6. [闭环] 更新数据库
-            final_answer = "".join(full_answer_buffer)
-            await self.repo.update_answer(qa_id, final_answer, "COMPLETED")
-            await self.repo.session.commit()
+            yield b"data: [DONE]\n\n"
 
-            yield "data: [DONE]\n\n"
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开: 任务取消 (CancelledError) 或 Starlette 关闭生成器 (GeneratorExit)
+            # 均不可吞掉，FAILED 回写由下方 finally 兜底
+            logger.info(f"Stream cancelled for qa_id={qa_id}")
+            raise
 
-        except APIError as e:
+        except (APIError, httpx.HTTPError) as e:
+            # LLM 调用链路错误 (SDK 异常或流式读取中断)
             logger.error(f"LLM API Error for qa_id={qa_id}: {e}")
-            yield f"data: [ERROR] AI Service Error: {e.message}\n\n"
-            await self._handle_failure(qa_id)
+            message = e.message if isinstance(e, APIError) else str(e)
+            yield f"data: [ERROR] AI Service Error: {message}\n\n".encode()
+            await status.fail(self.repo)
 
         except Exception as e:  # noqa: BLE001
             logger.error(f"Stream failed for qa_id={qa_id}: {e}")
-            yield f"data: [ERROR] System Error: {str(e)}\n\n"
-            await self._handle_failure(qa_id)
+            yield f"data: [ERROR] System Error: {str(e)}\n\n".encode()
+            await status.fail(self.repo)
 
-    async def _handle_failure(self, qa_id: UUID) -> None:
+        finally:
+            # 未写入终态即退出时，由独立会话在后台回写 FAILED
+            status.close()
+
+    @staticmethod
+    async def _persist_answer(status: QAStatusTracker, final_answer: str) -> None:
         """
-        辅助: 失败状态回写
+        辅助: 后台回写最终答案 (先等待 GENERATING 写入，保证写入顺序)。
+        使用独立的短生命周期会话，避免依赖已随请求关闭的 Session。
         """
+        await status.generating
         try:
-            await self.repo.update_status(qa_id, "FAILED")
-            await self.repo.session.commit()
-        except Exception as db_e:  # noqa: BLE001
-            logger.error(f"Failed to update DB status for qa_id={qa_id}: {db_e}")
+            async with AsyncSessionLocal() as session:
+                repo = InsightsQARepository(session)
+                await repo.update_answer(status.qa_id, final_answer, "COMPLETED")
+                await session.commit()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Failed to persist answer for qa_id={status.qa_id}: {e}")
+            # 后台任务中请求会话已关闭，失败状态同样经由独立会话回写
+            await status.set_status("FAILED")
 
     async def get_chat_history(self, req: ChatHistoryRequest) -> list[ChatRecordItem]:
         """
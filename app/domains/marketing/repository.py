@@ -3,7 +3,7 @@ File: app/domains/marketing/repository.py
 Description: 营销领域仓储层
 
 包含：
-1. MarketingReportRepository: 报告数据的查询 (CTE 分组 Top-N 策略)
+1. MarketingReportRepository: 报告数据的查询 (子查询分组 Top-N 策略)
 2. MarketingQARepository: 智能问答记录的持久化与状态更新
 
 Author: jinmozhe
@@ -11,172 +11,363 @@ Created: 2026-02-03
 Updated: 2026-02-10 (Implement Top-4 Periods Logic)
 """
 
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from functools import lru_cache
+from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel
-from sqlalchemy import asc, desc, select, update
+from sqlalchemy import (
+    Integer,
+    Select,
+    asc,
+    bindparam,
+    cast,
+    desc,
+    exists,
+    func,
+    insert,
+    lambda_stmt,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.engine import Row, RowMapping
+from sqlalchemy.orm import aliased, raiseload
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
 from app.db.models.marketing_report import MarketingReport
 from app.db.models.marketing_report_qa import MarketingReportQA
-from app.db.repositories.base import BaseRepository
+from app.db.repositories.base import QueryRepository
 
 
-class MarketingReportRepository(BaseRepository[MarketingReport, BaseModel, BaseModel]):
+# ------------------------------------------------------------------------------
+# 预构建语句 (bindparam 参数化，结构稳定，编译结果可被引擎缓存复用)
+# ------------------------------------------------------------------------------
+@lru_cache(maxsize=1)
+def _flat_reports_stmt() -> Select:
+    """
+    构建 get_flat_reports 的查询语句 (仅构建一次)。
+    """
+    # 1. 定义子查询：找出最近的 N 个唯一周期
+    # SELECT DISTINCT ON (period_start, period_end) ... ORDER BY start DESC, end DESC LIMIT 4
+    # [Perf] 使用内联子查询而非 CTE，避免 CTE 成为优化屏障，便于规划器下推谓词
+    # [Perf] DISTINCT ON 替代 GROUP BY 去重：配合 ix_mk_report_user_mkt_pstart 可按索引顺序
+    #        流式去重，取满 N 个周期即停止，无需对用户全部行做哈希/排序
+    target_periods = (
+        select(MarketingReport.period_start, MarketingReport.period_end)
+        .distinct(MarketingReport.period_start, MarketingReport.period_end)  # 去重
+        .where(
+            MarketingReport.user_id == bindparam("user_id"),
+            MarketingReport.marketplace_id == bindparam("marketplace_id"),
+        )
+        .order_by(
+            desc(MarketingReport.period_start), desc(MarketingReport.period_end)
+        )  # 倒序
+        .limit(bindparam("period_limit", type_=Integer))  # 限制周期数量 (默认4)
+        .subquery("target_periods")
+    )
+
+    # 2. 主查询：Inner Join 该子查询
+    # SELECT * FROM table JOIN (subquery) ON period_match ...
+    stmt = (
+        select(
+            MarketingReport.id,
+            MarketingReport.week,
+            MarketingReport.ad_type,
+            MarketingReport.period_start,
+            MarketingReport.period_end,
+            MarketingReport.report_type,
+            MarketingReport.report_source,
+            MarketingReport.pdf_path,
+        )
+        .join(
+            target_periods,
+            (MarketingReport.period_start == target_periods.c.period_start)
+            & (MarketingReport.period_end == target_periods.c.period_end),
+        )
+        .where(
+            MarketingReport.user_id == bindparam("user_id"),
+            MarketingReport.marketplace_id == bindparam("marketplace_id"),
+        )
+        .order_by(desc(MarketingReport.period_start))
+    )
+    return stmt
+
+
+_REPORTS_VERSION_STMT = select(
+    func.max(MarketingReport.updated_at), func.count()
+).where(
+    MarketingReport.user_id == bindparam("user_id"),
+    MarketingReport.marketplace_id == bindparam("marketplace_id"),
+)
+
+# 仅判断上下文是否可用 (EXISTS，不传输 JSONB 大字段)
+# 与原 `if not mcp_data` 语义一致：报告不存在或 mcp_data 为空对象均视为不可用
+_REPORT_CONTEXT_EXISTS_STMT = select(
+    exists().where(
+        MarketingReport.id == bindparam("report_id"),
+        MarketingReport.mcp_data != cast({}, JSONB),
+    )
+)
+
+# [N+1 防护] 问答实体查询统一附加 raiseload("*")：
+# 任何未显式声明加载策略的关系访问都会直接报错，而非静默触发逐行 Lazy SELECT。
+# 如后续确需关联数据，请显式使用 selectinload(...) 批量加载。
+_QA_BY_ID_STMT = (
+    select(MarketingReportQA)
+    .where(MarketingReportQA.id == bindparam("qa_id"))
+    .options(raiseload("*"))
+)
+
+
+@lru_cache(maxsize=1)
+def _recent_history_stmt() -> Select:
+    """
+    构建 get_recent_history 的查询语句 (仅构建一次)。
+    内层倒序取最近 N 条，外层按时间正序返回，省去 Python 端翻转。
+    """
+    inner = (
+        select(MarketingReportQA)
+        .where(
+            MarketingReportQA.report_id == bindparam("report_id"),
+            MarketingReportQA.id != bindparam("current_qa_id"),  # 排除当前这条
+            MarketingReportQA.status == "COMPLETED",  # 必须是已完成的
+            MarketingReportQA.answer.is_not(None),  # 必须有回答
+        )
+        .order_by(desc(MarketingReportQA.created_at))  # 倒序取最近的
+        .limit(bindparam("limit", type_=Integer))
+        .subquery("recent")
+    )
+    recent = aliased(MarketingReportQA, inner)
+    return select(recent).options(raiseload("*")).order_by(asc(inner.c.created_at))
+
+
+@lru_cache(maxsize=1)
+def _context_bundle_stmt() -> Select:
+    """
+    构建 get_context_bundle 的查询语句 (仅构建一次)。
+    两个标量子查询合并为一条 SELECT：
+    - mcp_data: 报告上下文
+    - history: 最近 N 条已完成问答，按时间正序聚合为 [[question, answer], ...]
+    """
+    mcp_data = (
+        select(MarketingReport.mcp_data)
+        .where(MarketingReport.id == bindparam("report_id"))
+        .scalar_subquery()
+    )
+
+    recent = (
+        select(
+            MarketingReportQA.question,
+            MarketingReportQA.answer,
+            MarketingReportQA.created_at,
+        )
+        .where(
+            MarketingReportQA.report_id == bindparam("report_id"),
+            MarketingReportQA.id != bindparam("current_qa_id"),  # 排除当前这条
+            MarketingReportQA.status == "COMPLETED",  # 必须是已完成的
+            MarketingReportQA.answer.is_not(None),  # 必须有回答
+        )
+        .order_by(desc(MarketingReportQA.created_at))  # 倒序取最近的
+        .limit(bindparam("limit", type_=Integer))
+        .subquery("recent")
+    )
+    history = select(
+        func.jsonb_agg(
+            aggregate_order_by(
+                func.jsonb_build_array(recent.c.question, recent.c.answer),
+                asc(recent.c.created_at),
+            ),
+            type_=JSONB,
+        )
+    ).scalar_subquery()
+
+    return select(mcp_data.label("mcp_data"), history.label("history"))
+
+
+def _chat_history_stmt(
+    user_id: str, marketplace_id: str, report_id: UUID
+) -> StatementLambdaElement:
+    """
+    构建对话历史查询 (lambda_stmt)。
+    按 lambda 代码对象缓存语句结构，闭包变量自动转为绑定参数。
+    """
+    stmt = lambda_stmt(lambda: select(MarketingReportQA))
+    stmt += lambda s: s.where(
+        MarketingReportQA.report_id == report_id,
+        MarketingReportQA.user_id == user_id,
+        MarketingReportQA.marketplace_id == marketplace_id,
+    )
+    stmt += lambda s: s.order_by(asc(MarketingReportQA.created_at))
+    stmt += lambda s: s.options(raiseload("*"))
+    return stmt
+
+
+class MarketingReportRepository(QueryRepository):
     """
     营销报告仓储
     """
 
+    async def get_reports_version(
+        self, user_id: str, marketplace_id: str
+    ) -> tuple[datetime | None, int]:
+        """
+        获取用户报告集合的版本标识 (最近更新时间, 记录数)。
+        单次聚合查询，用于列表接口的 ETag 协商缓存；
+        记录数可覆盖删除场景 (删除不会推高 updated_at)。
+        """
+        result = await self.session.execute(
+            _REPORTS_VERSION_STMT,
+            {"user_id": user_id, "marketplace_id": marketplace_id},
+        )
+        max_updated_at, total = result.one()
+        return max_updated_at, total
+
     async def get_flat_reports(
         self, user_id: str, marketplace_id: str, period_limit: int = 4
-    ) -> list[MarketingReport]:
+    ) -> Sequence[RowMapping]:
         """
-        获取用户最近的报告列表。
+        获取用户最近的报告列表 (列投影，返回 dict-like 行)。
 
         [Business Rule] 永远只返回最近的 N 个周期(Period)的数据。
         逻辑：
         1. 先找出最近的 period_limit 个唯一周期 (Start/End)。
         2. 再查找属于这些周期的所有报告记录。
         """
-
-        # 1. 定义 CTE：找出最近的 N 个唯一周期
-        # SELECT distinct period_start, period_end FROM table ... ORDER BY start DESC LIMIT 4
-        target_periods_cte = (
-            select(MarketingReport.period_start, MarketingReport.period_end)
-            .where(
-                MarketingReport.user_id == user_id,
-                MarketingReport.marketplace_id == marketplace_id,
-            )
-            .group_by(MarketingReport.period_start, MarketingReport.period_end)  # 去重
-            .order_by(desc(MarketingReport.period_start))  # 倒序
-            .limit(period_limit)  # 限制周期数量 (默认4)
-            .cte("target_periods")
-        )
-
-        # 2. 主查询：Inner Join 这个 CTE
-        # SELECT * FROM table JOIN cte ON period_match ...
-        stmt = (
-            select(
-                MarketingReport.id,
-                MarketingReport.week,
-                MarketingReport.ad_type,
-                MarketingReport.period_start,
-                MarketingReport.period_end,
-                MarketingReport.report_type,
-                MarketingReport.report_source,
-                MarketingReport.pdf_path,
-            )
-            .join(
-                target_periods_cte,
-                (MarketingReport.period_start == target_periods_cte.c.period_start)
-                & (MarketingReport.period_end == target_periods_cte.c.period_end),
-            )
-            .where(
-                MarketingReport.user_id == user_id,
-                MarketingReport.marketplace_id == marketplace_id,
-            )
-            .order_by(desc(MarketingReport.period_start))
+        result = await self.session.execute(
+            _flat_reports_stmt(),
+            {
+                "user_id": user_id,
+                "marketplace_id": marketplace_id,
+                "period_limit": period_limit,
+            },
         )
-
-        result = await self.session.execute(stmt)
-        return list(result.all())  # type: ignore
+        return result.mappings().all()
 
 
-class MarketingQARepository(BaseRepository[MarketingReportQA, BaseModel, BaseModel]):
+class MarketingQARepository(QueryRepository):
     """
     营销问答仓储
     """
 
-    async def get_report_mcp_data(self, report_id: UUID) -> dict | None:
+    async def has_report_context(self, report_id: UUID) -> bool:
         """
-        获取 RAG 所需的上下文数据 (mcp_data)。
+        [Fail Fast] 仅判断报告是否存在可用的 mcp_data。
+        用于 init_chat 校验，避免为一次存在性判断拉取整个 JSONB 文档。
         """
-        stmt = select(MarketingReport.mcp_data).where(MarketingReport.id == report_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        result = await self.session.execute(
+            _REPORT_CONTEXT_EXISTS_STMT, {"report_id": report_id}
+        )
+        return bool(result.scalar())
+
+    async def get_context_bundle(
+        self, report_id: UUID, current_qa_id: UUID, limit: int = 5
+    ) -> tuple[dict | None, list[tuple[str, str]]]:
+        """
+        [RAG Context] 单次往返同时获取 mcp_data 与最近 N 轮历史对话。
+
+        Returns:
+            (mcp_data, [(question, answer), ...])，历史按时间正序 (旧 -> 新)
+        """
+        result = await self.session.execute(
+            _context_bundle_stmt(),
+            {"report_id": report_id, "current_qa_id": current_qa_id, "limit": limit},
+        )
+        row = result.one()
+        history = [(q, a) for q, a in row.history or ()]
+        return row.mcp_data, history
 
     async def get_qa_by_id(self, qa_id: UUID) -> MarketingReportQA | None:
         """
         获取单条问答记录。
         """
-        stmt = select(MarketingReportQA).where(MarketingReportQA.id == qa_id)
-        result = await self.session.execute(stmt)
+        result = await self.session.execute(_QA_BY_ID_STMT, {"qa_id": qa_id})
         return result.scalar_one_or_none()
 
     async def create_qa_record(
         self, user_id: str, marketplace_id: str, report_id: UUID, question: str
-    ) -> MarketingReportQA:
+    ) -> UUID:
         """
         创建一条初始状态(PENDING)的问答记录。
+        使用 INSERT ... RETURNING 在一次往返中拿到主键，无需 refresh。
         """
-        qa_record = MarketingReportQA(
-            user_id=user_id,
-            marketplace_id=marketplace_id,
-            report_id=report_id,
-            question=question,
-            status="PENDING",
-            answer=None,
+        stmt = (
+            insert(MarketingReportQA)
+            .values(
+                user_id=user_id,
+                marketplace_id=marketplace_id,
+                report_id=report_id,
+                question=question,
+                status="PENDING",
+                answer=None,
+            )
+            .returning(MarketingReportQA.id)
         )
-        self.session.add(qa_record)
-        return qa_record
+        result = await self.session.execute(stmt)
+        return result.scalar_one()
 
-    async def update_status(self, qa_id: UUID, status: str) -> None:
+    async def patch(self, qa_id: UUID, **fields: Any) -> Row | None:
         """
-        仅更新状态。
+        通用局部更新 (UPDATE ... RETURNING)。
+        单条语句完成更新并回传 (id, status, updated_at)，无需额外查询确认。
+
+        Returns:
+            Row | None: 更新后的行快照，记录不存在时为 None
         """
         stmt = (
             update(MarketingReportQA)
             .where(MarketingReportQA.id == qa_id)
-            .values(status=status)
+            .values(**fields)
+            .returning(
+                MarketingReportQA.id,
+                MarketingReportQA.status,
+                MarketingReportQA.updated_at,
+            )
         )
-        await self.session.execute(stmt)
+        result = await self.session.execute(stmt)
+        return result.one_or_none()
 
-    async def update_answer(self, qa_id: UUID, answer: str, status: str) -> None:
+    async def update_status(self, qa_id: UUID, status: str) -> Row | None:
+        """
+        仅更新状态。
+        """
+        return await self.patch(qa_id, status=status)
+
+    async def update_answer(self, qa_id: UUID, answer: str, status: str) -> Row | None:
         """
         更新最终回答内容和状态。
         """
-        stmt = (
-            update(MarketingReportQA)
-            .where(MarketingReportQA.id == qa_id)
-            .values(answer=answer, status=status)
-        )
-        await self.session.execute(stmt)
+        return await self.patch(qa_id, answer=answer, status=status)
 
-    async def get_chat_history(
-        self, user_id: str, marketplace_id: str, report_id: UUID
-    ) -> list[MarketingReportQA]:
+    async def stream_chat_history(
+        self,
+        user_id: str,
+        marketplace_id: str,
+        report_id: UUID,
+        batch_size: int = 64,
+    ) -> AsyncIterator[Sequence[MarketingReportQA]]:
         """
-        获取指定报告的对话历史，按时间正序排列。
+        以服务端游标分批读取对话历史 (按时间正序)。
+        内存占用为 O(batch_size)，首批数据到达即可开始序列化。
         """
-        stmt = (
-            select(MarketingReportQA)
-            .where(
-                MarketingReportQA.report_id == report_id,
-                MarketingReportQA.user_id == user_id,
-                MarketingReportQA.marketplace_id == marketplace_id,
-            )
-            .order_by(asc(MarketingReportQA.created_at))
+        stmt = _chat_history_stmt(user_id, marketplace_id, report_id)
+        result = await self.session.stream(
+            stmt, execution_options={"yield_per": batch_size}
         )
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        async for partition in result.scalars().partitions():
+            yield partition
 
     async def get_recent_history(
         self, report_id: UUID, current_qa_id: UUID, limit: int = 5
-    ) -> list[MarketingReportQA]:
+    ) -> Sequence[MarketingReportQA]:
         """
         [RAG Context] 获取当前对话之前的最近 N 条历史记录。
         用于构建 LLM 的 Multi-turn Context (Sliding Window)。
+        结果已在 SQL 中按时间正序排列 (旧 -> 新)，符合 LLM 阅读习惯。
         """
-        stmt = (
-            select(MarketingReportQA)
-            .where(
-                MarketingReportQA.report_id == report_id,
-                MarketingReportQA.id != current_qa_id,  # 排除当前这条
-                MarketingReportQA.status == "COMPLETED",  # 必须是已完成的
-                MarketingReportQA.answer.is_not(None),  # 必须有回答
-            )
-            .order_by(desc(MarketingReportQA.created_at))  # 倒序取最近的
-            .limit(limit)
+        result = await self.session.execute(
+            _recent_history_stmt(),
+            {"report_id": report_id, "current_qa_id": current_qa_id, "limit": limit},
         )
-        result = await self.session.execute(stmt)
-        # 翻转为正序 (时间轴: 旧 -> 新)，符合 LLM 阅读习惯
-        return list(reversed(list(result.scalars().all())))
+        return result.scalars().all()
@@ -12,7 +12,8 @@ from typing import Annotated
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
 
 from app.api.deps import DBSession
 from app.core.response import ResponseModel
@@ -32,18 +33,33 @@ from app.domains.marketing.service import MarketingQAService, MarketingReportSer
 
 router = APIRouter()
 
+# 列表响应序列化器 (模块级构建一次)
+# dump_json 在 pydantic-core 中直接产出 bytes，绕过 jsonable_encoder 的逐字段遍历
+_REPORT_LIST_RESP_ADAPTER = TypeAdapter(ResponseModel[list[MarketingReportItem]])
+_CHAT_RECORDS_ADAPTER = TypeAdapter(list[ChatRecordItem])
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否命中当前 ETag (支持多值与弱校验前缀 W/)。
+    """
+    if not if_none_match:
+        return False
+    candidates = (c.strip().removeprefix("W/") for c in if_none_match.split(","))
+    return any(c == etag or c == "*" for c in candidates)
+
 
 # ------------------------------------------------------------------------------
 # Dependencies
 # ------------------------------------------------------------------------------
 async def get_marketing_service(session: DBSession) -> MarketingReportService:
-    repo = MarketingReportRepository(model=None, session=session)  # type: ignore
+    repo = MarketingReportRepository(session)
     return MarketingReportService(repo)
 
 
 async def get_qa_service(session: DBSession) -> MarketingQAService:
     # QA Service 需要 MarketingQARepository
-    repo = MarketingQARepository(model=None, session=session)  # type: ignore
+    repo = MarketingQARepository(session)
     return MarketingQAService(repo)
 
 
@@ -66,14 +82,24 @@ async def get_report_list_demo(
     request: Request,
     req_data: ReportListRequest,
     service: MarketingServiceDep,
-) -> ResponseModel[list[MarketingReportItem]]:
+) -> Response:
     """
     精简列表接口 (POST)
+    支持 ETag 协商缓存：数据未变化时直接返回 304，跳过列表查询与序列化。
     """
+    etag = await service.get_demo_list_etag(req_data.user_id, req_data.marketplace_id)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
     data = await service.get_demo_list(req_data.user_id, req_data.marketplace_id)
-    return ResponseModel.success(
+    payload = ResponseModel[list[MarketingReportItem]].success(
         data=data, request_id=getattr(request.state, "request_id", None)
     )
+    return Response(
+        content=_REPORT_LIST_RESP_ADAPTER.dump_json(payload),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
 # ------------------------------------------------------------------------------
@@ -121,6 +147,8 @@ async def stream_chat_answer(
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            # 禁止中间件对流式响应做压缩，保证逐帧直达客户端
+            "Content-Encoding": "identity",
         },
     )
 
@@ -135,11 +163,13 @@ async def get_chat_history_list(
     request: Request,
     req_data: ChatHistoryRequest,
     service: QAServiceDep,
-) -> ResponseModel[list[ChatRecordItem]]:
+) -> Response:
     """
     Step 3: 获取历史记录 (用于页面刷新后恢复会话)
+    响应信封与列表项按批流式输出，长会话不会一次性加载全部记录 (短会话直接返回完整响应)。
     """
-    data = await service.get_chat_history(req_data)
-    return ResponseModel.success(
-        data=data, request_id=getattr(request.state, "request_id", None)
+    return await ResponseModel.stream_list_response(
+        service.iter_chat_history(req_data),
+        _CHAT_RECORDS_ADAPTER,
+        request_id=getattr(request.state, "request_id", None),
     )
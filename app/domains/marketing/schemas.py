@@ -6,6 +6,8 @@ Description: 营销领域 Pydantic 模型
 1. 报告列表查询 (ReportListRequest, MarketingReportItem)
 2. 智能问答交互 (ChatInitRequest, ChatInitResponse, ChatHistoryRequest, ChatRecordItem)
 
+注意: 响应模型 (ORM -> 出参) 均为只读: frozen=True 禁止构建后修改，extra="ignore" 忽略多余字段。
+
 Author: jinmozhe
 Created: 2026-02-03
 Updated: 2026-02-10 (Add week field)
@@ -45,7 +47,7 @@ class MarketingReportItem(BaseModel):
     report_source: str = Field(..., description="报告来源 (开放录入)")
     pdf_path: str | None = Field(default=None, description="PDF文件路径")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 # ==============================================================================
@@ -93,4 +95,4 @@ class ChatRecordItem(BaseModel):
     status: str = Field(..., description="状态: PENDING/GENERATING/COMPLETED/FAILED")
     created_at: datetime = Field(..., description="提问时间")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
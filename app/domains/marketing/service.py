@@ -4,23 +4,31 @@ Description: 营销领域服务
 
 职责：
 1. MarketingReportService: 报告列表数据转换
-2. MarketingQARepository: 编排 RAG 流程，调用 LLM (含多轮对话历史)，管理对话状态
+2. MarketingQAService: 编排 RAG 流程，调用 LLM (含多轮对话历史)，管理对话状态
 
 Author: jinmozhe
 Created: 2026-02-03
 Updated: 2026-02-10 (Fix TypeError: limit -> period_limit)
 """
 
-import json
-from collections.abc import AsyncGenerator
+import asyncio
+import hashlib
+from collections.abc import AsyncGenerator, Iterable
+from io import StringIO
+from typing import Any
 from uuid import UUID
 
+import httpx
+import orjson
+from cachetools import TTLCache
 from loguru import logger
-from openai import APIError, AsyncOpenAI
+from openai import APIError
 from openai.types.chat import ChatCompletionMessageParam
 
 from app.core.config import settings
 from app.core.exceptions import AppException
+from app.core.llm import get_llm_client, trim_history
+from app.core.tasks import QAStatusTracker
 from app.domains.marketing.constants import MarketingErrorCode
 from app.domains.marketing.repository import (
     MarketingQARepository,
@@ -34,11 +42,68 @@ from app.domains.marketing.schemas import (
     MarketingReportItem,
 )
 
+# DTO 字段名 (模块加载时计算一次)
+# 数据来自本库查询结果，类型已由 SQLAlchemy 列定义保证，
+# 因此 DB -> DTO 转换使用 model_construct 跳过重复校验 (外部请求入参仍完整校验)
+_REPORT_FIELDS = tuple(MarketingReportItem.model_fields)
+_CHAT_RECORD_FIELDS = tuple(ChatRecordItem.model_fields)
+
+# SSE 保活：LLM 首 Token 较慢 (如推理模型) 时，每 15 秒发送一次注释帧，防止代理断开空闲连接
+_SSE_PING_INTERVAL = 15.0
+_SSE_PING = b": ping\n\n"
+
+# SSE 合帧策略：累计 8 个 Token 或首个待发 Token 等待超过 20ms 即合并发送
+_SSE_FLUSH_TOKENS = 8
+_SSE_FLUSH_INTERVAL = 0.02
+
+# RAG 系统提示词 (模块级常量)
+_SYSTEM_PROMPT = (
+    "你是一个亚马逊广告营销专家。请根据提供的 JSON 数据（营销报告）回答用户问题。"
+    "回答要专业、简洁，并使用 Markdown 格式。"
+    "如果数据中没有相关信息，请直接说明。"
+)
+_SYSTEM_PROMPT_PREFIX = _SYSTEM_PROMPT + "\n\n数据:\n"
+
+# 报告上下文缓存 (report_id -> 已拼接好的完整 System Message: 提示词 + mcp_data JSON)
+# mcp_data 写入后基本不变；命中时 init_chat 免去存在性查询，
+# 流式阶段免去 JSONB 传输、序列化与大字符串拼接
+_CONTEXT_CACHE: TTLCache[UUID, str] = TTLCache(maxsize=512, ttl=300)
+
+
+def _content_frame(text: str) -> bytes:
+    """
+    辅助: 构造 SSE content 帧 (data: <json>\n\n，直接拼接字节)
+    """
+    return b"data: " + orjson.dumps({"content": text}) + b"\n\n"
+
+
+def _to_chat_records(rows: Iterable[Any]) -> list[ChatRecordItem]:
+    """
+    辅助: ORM 问答记录 -> ChatRecordItem (受信数据，跳过校验)
+    """
+    return [
+        ChatRecordItem.model_construct(
+            **{f: getattr(row, f) for f in _CHAT_RECORD_FIELDS}
+        )
+        for row in rows
+    ]
+
 
 class MarketingReportService:
     def __init__(self, repo: MarketingReportRepository):
         self.repo = repo
 
+    async def get_demo_list_etag(self, user_id: str, marketplace_id: str) -> str:
+        """
+        计算精简列表的 ETag (基于报告集合版本，不加载列表本身)。
+        """
+        max_updated_at, total = await self.repo.get_reports_version(
+            user_id, marketplace_id
+        )
+        version = f"{max_updated_at.isoformat() if max_updated_at else '-'}|{total}"
+        digest = hashlib.blake2b(version.encode(), digest_size=16).hexdigest()
+        return f'"{digest}"'
+
     async def get_demo_list(
         self, user_id: str, marketplace_id: str
     ) -> list[MarketingReportItem]:
@@ -49,9 +114,11 @@ class MarketingReportService:
         # 之前 Repository 层修改为按周期分组(Top-4 Periods)，因此参数名已变更为 period_limit
         rows = await self.repo.get_flat_reports(user_id, marketplace_id, period_limit=4)
 
-        # 自动映射 row -> schema, 包含 week 字段
-        items = [MarketingReportItem.model_validate(row) for row in rows]
-        return items
+        # row mapping -> schema (包含 week 字段)，受信数据跳过校验
+        return [
+            MarketingReportItem.model_construct(**{f: row[f] for f in _REPORT_FIELDS})
+            for row in rows
+        ]
 
 
 class MarketingQAService:
@@ -61,90 +128,98 @@ class MarketingQAService:
 
     def __init__(self, repo: MarketingQARepository):
         self.repo = repo
-        # 初始化 OpenAI 异步客户端 (复用 DeepSeek 配置)
-        self.llm_client = AsyncOpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL,
-            timeout=60.0,
-            max_retries=2,
-        )
+        # 复用全局 LLM 客户端 (共享 httpx 连接池，保持 Keep-Alive)
+        self.llm_client = get_llm_client()
 
     async def init_chat(self, req: ChatInitRequest) -> ChatInitResponse:
         """
         第一步：初始化对话。
         创建数据库记录，状态为 PENDING。
         """
-        # 1. 校验 Report 是否存在
-        mcp_data = await self.repo.get_report_mcp_data(req.report_id)
-        if not mcp_data:
+        # 1. 校验 Report 是否存在 (优先命中上下文缓存，否则 EXISTS 判断，不拉取 mcp_data)
+        if (
+            req.report_id not in _CONTEXT_CACHE
+            and not await self.repo.has_report_context(req.report_id)
+        ):
             raise AppException(MarketingErrorCode.REPORT_NOT_FOUND)
 
         # 2. 创建 QA 记录
-        qa_record = await self.repo.create_qa_record(
+        # INSERT ... RETURNING 直接返回主键
+        qa_id = await self.repo.create_qa_record(
             user_id=req.user_id,
             marketplace_id=req.marketplace_id,
             report_id=req.report_id,
             question=req.question,
         )
 
-        # 3. 提交事务 (生成 ID)
+        # 3. 提交事务
         await self.repo.session.commit()
-        await self.repo.session.refresh(qa_record)
 
-        return ChatInitResponse(qa_id=qa_record.id)
+        return ChatInitResponse(qa_id=qa_id)
 
-    async def stream_answer_generator(self, qa_id: UUID) -> AsyncGenerator[str, None]:
+    async def stream_answer_generator(self, qa_id: UUID) -> AsyncGenerator[bytes, None]:
         """
         第二步：流式生成答案 (Async Generator)。
+        输出为已编码的 SSE 字节帧；LLM 长时间无输出时发送注释帧保活。
         """
         # 1. 获取 QA 记录
         qa_record = await self.repo.get_qa_by_id(qa_id)
         if not qa_record:
-            yield "data: [ERROR] Session not found\n\n"
+            yield b"data: [ERROR] Session not found\n\n"
             return
 
-        # 2. 获取上下文 (mcp_data)
-        mcp_data = await self.repo.get_report_mcp_data(qa_record.report_id)
-        if not mcp_data:
-            yield "data: [ERROR] Report context missing\n\n"
-            return
+        # 2. 获取上下文 (mcp_data + 最近 5 轮历史)
+        # 历史对话帮助模型理解上下文 (如 "为什么 ROAS 这么低?")
+        system_message = _CONTEXT_CACHE.get(qa_record.report_id)
+        if system_message is not None:
+            # 缓存命中: 仅查询历史记录
+            records = await self.repo.get_recent_history(
+                report_id=qa_record.report_id, current_qa_id=qa_id, limit=5
+            )
+            history = [(r.question, r.answer) for r in records]
+        else:
+            # 缓存未命中: mcp_data 与历史单次查询，序列化后写入缓存
+            mcp_data, history = await self.repo.get_context_bundle(
+                report_id=qa_record.report_id,
+                current_qa_id=qa_id,
+                limit=5,
+            )
+            if not mcp_data:
+                yield b"data: [ERROR] Report context missing\n\n"
+                return
+            # orjson 原生输出 UTF-8 (等价 ensure_ascii=False)，大文档序列化远快于标准库
+            system_message = _SYSTEM_PROMPT_PREFIX + orjson.dumps(mcp_data).decode(
+                "utf-8"
+            )
+            _CONTEXT_CACHE[qa_record.report_id] = system_message
 
-        # 3. 更新状态: PENDING -> GENERATING
-        await self.repo.update_status(qa_id, "GENERATING")
-        await self.repo.session.commit()
+        # 3. 更新状态: PENDING -> GENERATING (后台独立会话提交，不阻塞 LLM 调用)
+        # 终态回写前会先等待该任务完成，保证 GENERATING 不会覆盖终态
+        status = QAStatusTracker.start(MarketingQARepository, qa_id, name="marketing")
+        # 结束只读事务并归还连接，LLM 流式生成期间本会话不占用连接，
+        # 结束时的 update_answer 会重新签出连接 (长连接 SSE 不会耗尽连接池)
+        await self.repo.session.close()
 
         # 4. 准备 Prompt 和 消息链
-        system_prompt = (
-            "你是一个亚马逊广告营销专家。请根据提供的 JSON 数据（营销报告）回答用户问题。"
-            "回答要专业、简洁，并使用 Markdown 格式。"
-            "如果数据中没有相关信息，请直接说明。"
-        )
-        context_str = json.dumps(mcp_data, ensure_ascii=False)
-
-        # A. 基础 System Message
+        # A. 基础 System Message (直接复用缓存中的完整字符串)
         messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": f"{system_prompt}\n\n数据:\n{context_str}"}
+            {"role": "system", "content": system_message}
         ]
 
-        # B. 注入历史记录 (Sliding Window Strategy)
-        # 获取最近 5 条历史对话，帮助模型理解上下文 (如 "为什么 ROAS 这么低?")
-        history_records = await self.repo.get_recent_history(
-            report_id=qa_record.report_id,
-            current_qa_id=qa_id,
-            limit=5,
-        )
-
-        for record in history_records:
-            if record.question and record.answer:
-                # User Message
-                messages.append({"role": "user", "content": record.question})
-                # Assistant Message (⚠️注意：只放 answer，不放 CoT 过程)
-                messages.append({"role": "assistant", "content": record.answer})
+        # B. 注入历史记录 (Sliding Window Strategy + Token 预算裁剪，优先保留最近轮次)
+        for question, answer in trim_history(
+            history, settings.LLM_HISTORY_TOKEN_BUDGET
+        ):
+            # User Message
+            messages.append({"role": "user", "content": question})
+            # Assistant Message (⚠️注意：只放 answer，不放 CoT 过程)
+            messages.append({"role": "assistant", "content": answer})
 
         # C. 放入当前用户的新问题
         messages.append({"role": "user", "content": qa_record.question})
 
-        full_answer_buffer = []
+        # 完整回答缓冲 (连续可扩容缓冲区，结束时一次性读取，无中间列表)
+        answer_buf = StringIO()
 
         try:
             # 5. 使用 OpenAI SDK 调用 DeepSeek
@@ -155,50 +230,92 @@ class MarketingQAService:
                 temperature=0.5,
             )
 
-            async for chunk in stream:
-                delta = chunk.choices[0].delta
-                content = delta.content
-
-                if content:
-                    full_answer_buffer.append(content)
-                    # 实时推送 (SSE 格式: data: <json>\n\n)
-                    yield f"data: {json.dumps({'content': content}, ensure_ascii=False)}\n\n"
-
-            # 6. [后端闭环] 流结束后，更新数据库为 COMPLETED
-            final_answer = "".join(full_answer_buffer)
-            await self.repo.update_answer(qa_id, final_answer, "COMPLETED")
+            # 逐块拉取并合帧推送：
+            # - 累计满 _SSE_FLUSH_TOKENS 个 Token，或首个待发 Token 等待超过
+            #   _SSE_FLUSH_INTERVAL，即合并为一个 content 帧发送
+            # - 无待发 Token 且超过保活间隔仍无新块时推送 ping，再继续等待同一个块
+            loop = asyncio.get_running_loop()
+            batch: list[str] = []
+            batch_started = 0.0
+            chunks = aiter(stream)
+            next_chunk = asyncio.ensure_future(anext(chunks))
+            try:
+                while True:
+                    if batch:
+                        timeout = batch_started + _SSE_FLUSH_INTERVAL - loop.time()
+                    else:
+                        timeout = _SSE_PING_INTERVAL
+                    done, _ = await asyncio.wait({next_chunk}, timeout=max(timeout, 0))
+                    if not done:
+                        if batch:
+                            yield _content_frame("".join(batch))
+                            batch.clear()
+                        else:
+                            yield _SSE_PING
+                        continue
+                    try:
+                        chunk = next_chunk.result()
+                    except StopAsyncIteration:
+                        break
+                    next_chunk = asyncio.ensure_future(anext(chunks))
+
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        answer_buf.write(content)
+                        if not batch:
+                            batch_started = loop.time()
+                        batch.append(content)
+                        if len(batch) >= _SSE_FLUSH_TOKENS:
+                            yield _content_frame("".join(batch))
+                            batch.clear()
+
+                # 刷出剩余 Token
+                if batch:
+                    yield _content_frame("".join(batch))
+            finally:
+                # 客户端断开或异常退出时，取消尚未完成的拉取
+                next_chunk.cancel()
+
+            # 6. [后端闭环] 流结束后，单条 UPDATE ... RETURNING 写入答案与 COMPLETED
+            await status.generating
+            await self.repo.update_answer(qa_id, answer_buf.getvalue(), "COMPLETED")
             await self.repo.session.commit()
+            status.settled = True
 
             # 发送结束信号
-            yield "data: [DONE]\n\n"
+            yield b"data: [DONE]\n\n"
 
-        except APIError as e:
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开: 任务取消 (CancelledError) 或 Starlette 关闭生成器 (GeneratorExit)
+            # 均不可吞掉，FAILED 回写由下方 finally 兜底
+            logger.info(f"Stream cancelled for qa_id={qa_id}")
+            raise
+
+        except (APIError, httpx.HTTPError) as e:
+            # LLM 调用链路错误 (SDK 异常或流式读取中断)
             logger.error(f"LLM API Error for qa_id={qa_id}: {e}")
-            yield f"data: [ERROR] AI Service Error: {e.message}\n\n"
-            await self._handle_failure(qa_id)
+            message = e.message if isinstance(e, APIError) else str(e)
+            yield f"data: [ERROR] AI Service Error: {message}\n\n".encode()
+            await status.fail(self.repo)
 
         except Exception as e:  # noqa: BLE001
             logger.error(f"Stream failed for qa_id={qa_id}: {e}")
-            yield f"data: [ERROR] System Error: {str(e)}\n\n"
-            await self._handle_failure(qa_id)
+            yield f"data: [ERROR] System Error: {str(e)}\n\n".encode()
+            await status.fail(self.repo)
 
-    async def _handle_failure(self, qa_id: UUID) -> None:
-        """
-        辅助方法：处理失败状态回写
-        """
-        try:
-            await self.repo.update_status(qa_id, "FAILED")
-            await self.repo.session.commit()
-        except Exception as db_e:  # noqa: BLE001
-            logger.error(f"Failed to update DB status for qa_id={qa_id}: {db_e}")
+        finally:
+            # 未写入终态即退出时，由独立会话在后台回写 FAILED
+            status.close()
 
-    async def get_chat_history(self, req: ChatHistoryRequest) -> list[ChatRecordItem]:
+    async def iter_chat_history(
+        self, req: ChatHistoryRequest
+    ) -> AsyncGenerator[list[ChatRecordItem], None]:
         """
-        获取对话历史列表
+        分批获取对话历史 (服务端游标，每批 64 条)
         """
-        rows = await self.repo.get_chat_history(
+        async for rows in self.repo.stream_chat_history(
             user_id=req.user_id,
             marketplace_id=req.marketplace_id,
             report_id=req.report_id,
-        )
-        return [ChatRecordItem.model_validate(row) for row in rows]
+        ):
+            yield _to_chat_records(rows)
@@ -11,12 +11,32 @@ Author: jinmozhe
 Created: 2026-02-12
 """
 
-from datetime import date
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime
+from functools import lru_cache
+from typing import TypeVar
 from uuid import UUID
 
 from pydantic import BaseModel
-from sqlalchemy import asc, desc, func, select, update
-from sqlalchemy.orm import load_only
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Row,
+    Select,
+    asc,
+    bindparam,
+    cast,
+    desc,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.operations_report import (
     OperationsAuditLog,
@@ -26,6 +46,161 @@ from app.db.models.operations_report import (
 )
 from app.db.repositories.base import BaseRepository
 
+_LogT = TypeVar("_LogT", OperationsChangeLog, OperationsAuditLog)
+
+
+@lru_cache(maxsize=1)
+def _flat_reports_stmt() -> Select:
+    """
+    构建 get_flat_reports 的查询语句 (仅构建一次)。
+    period_limit 等过滤条件均为 bindparam，一份编译结果服务所有用户与 N 值。
+
+    单次扫描：DENSE_RANK 按 (period_start, period_end) 倒序为周期编号，
+    外层保留排名 <= period_limit 的行，无需 CTE 回表 JOIN。
+    """
+    ranked = (
+        select(
+            OperationsReport.id,
+            OperationsReport.week,
+            OperationsReport.ad_type,
+            OperationsReport.period_start,
+            OperationsReport.period_end,
+            OperationsReport.report_type,
+            OperationsReport.report_source,
+            OperationsReport.pdf_path,
+            func.dense_rank()
+            .over(
+                order_by=(
+                    OperationsReport.period_start.desc(),
+                    OperationsReport.period_end.desc(),
+                )
+            )
+            .label("period_rank"),
+        )
+        .where(
+            OperationsReport.user_id == bindparam("user_id"),
+            OperationsReport.marketplace_id == bindparam("marketplace_id"),
+        )
+        .subquery("ranked")
+    )
+
+    stmt = (
+        select(*(c for c in ranked.c if c.key != "period_rank"))
+        .where(
+            ranked.c.period_rank <= bindparam("period_limit", type_=Integer)
+        )  # 限制周期数量 (默认4)
+        .order_by(desc(ranked.c.period_start))
+    )
+    return stmt
+
+
+# 问答热路径语句 (模块加载时构建一次，参数均为 bindparam，编译结果由语句缓存复用)
+# 仅判断上下文是否可用 (EXISTS，不传输 JSONB 大字段)
+# 与原 `if not mcp_data` 语义一致：报告不存在或 mcp_data 为空对象均视为不可用
+_REPORT_CONTEXT_EXISTS_STMT = select(
+    exists().where(
+        OperationsReport.id == bindparam("report_id"),
+        OperationsReport.mcp_data != cast({}, JSONB),
+    )
+)
+
+_QA_BY_ID_STMT = select(OperationsReportQA).where(
+    OperationsReportQA.id == bindparam("qa_id")
+)
+
+# 注意: SET 子句的参数名不能与列名相同 (status 为保留绑定名)
+_UPDATE_STATUS_STMT = (
+    update(OperationsReportQA)
+    .where(OperationsReportQA.id == bindparam("qa_id"))
+    .values(status=bindparam("new_status"))
+)
+
+
+@lru_cache(maxsize=1)
+def _recent_history_stmt() -> Select:
+    """
+    构建 get_recent_history 的查询语句 (仅构建一次)。
+    内层倒序取最近 N 条，外层按时间正序返回，省去 Python 端翻转。
+    仅投影 question / answer (及排序用的 created_at)，不加载整行 ORM 实体。
+    """
+    inner = (
+        select(
+            OperationsReportQA.question,
+            OperationsReportQA.answer,
+            OperationsReportQA.created_at,
+        )
+        .where(
+            OperationsReportQA.report_id == bindparam("report_id"),
+            OperationsReportQA.id != bindparam("current_qa_id"),  # 排除当前这条
+            OperationsReportQA.status == "COMPLETED",  # 必须是已完成的
+            OperationsReportQA.answer.is_not(None),  # 必须有回答
+        )
+        .order_by(desc(OperationsReportQA.created_at))  # 倒序取最近的
+        .limit(bindparam("limit", type_=Integer))
+        .subquery("recent")
+    )
+    return select(inner.c.question, inner.c.answer).order_by(asc(inner.c.created_at))
+
+
+@lru_cache(maxsize=1)
+def _context_bundle_stmt() -> Select:
+    """
+    构建 get_context_bundle 的查询语句 (仅构建一次)。
+    两个标量子查询合并为一条 SELECT：
+    - mcp_data: 报告上下文
+    - history: 最近 N 条已完成问答，按时间正序聚合为 [[question, answer], ...]
+    """
+    mcp_data = (
+        select(OperationsReport.mcp_data)
+        .where(OperationsReport.id == bindparam("report_id"))
+        .scalar_subquery()
+    )
+
+    recent = (
+        select(
+            OperationsReportQA.question,
+            OperationsReportQA.answer,
+            OperationsReportQA.created_at,
+        )
+        .where(
+            OperationsReportQA.report_id == bindparam("report_id"),
+            OperationsReportQA.id != bindparam("current_qa_id"),  # 排除当前这条
+            OperationsReportQA.status == "COMPLETED",  # 必须是已完成的
+            OperationsReportQA.answer.is_not(None),  # 必须有回答
+        )
+        .order_by(desc(OperationsReportQA.created_at))  # 倒序取最近的
+        .limit(bindparam("limit", type_=Integer))
+        .subquery("recent")
+    )
+    history = select(
+        func.jsonb_agg(
+            aggregate_order_by(
+                func.jsonb_build_array(recent.c.question, recent.c.answer),
+                asc(recent.c.created_at),
+            ),
+            type_=JSONB,
+        )
+    ).scalar_subquery()
+
+    return select(mcp_data.label("mcp_data"), history.label("history"))
+
+
+def _chat_history_stmt(
+    user_id: str, marketplace_id: str, report_id: UUID
+) -> Select[tuple[OperationsReportQA]]:
+    """
+    构建对话历史查询语句 (按时间正序)。
+    """
+    return (
+        select(OperationsReportQA)
+        .where(
+            OperationsReportQA.report_id == report_id,
+            OperationsReportQA.user_id == user_id,
+            OperationsReportQA.marketplace_id == marketplace_id,
+        )
+        .order_by(asc(OperationsReportQA.created_at))
+    )
+
 
 class OperationsReportRepository(
     BaseRepository[OperationsReport, BaseModel, BaseModel]
@@ -36,60 +211,23 @@ class OperationsReportRepository(
 
     async def get_flat_reports(
         self, user_id: str, marketplace_id: str, period_limit: int = 4
-    ) -> list[OperationsReport]:
+    ) -> Sequence[Row]:
         """
         获取用户最近的报告列表 (元数据)。
 
         [Business Rule] 永远只返回最近的 N 个周期(Period)的数据。
-        逻辑：
-        1. 先找出最近的 period_limit 个唯一周期 (Start/End)。
-        2. 再查找属于这些周期的所有报告记录。
+        逻辑：按周期 (Start/End) 倒序编号，保留前 period_limit 个周期的所有报告记录。
+        返回列投影行 (支持属性访问)，不构造 ORM 实体。
         """
-
-        # 1. 定义 CTE：找出最近的 N 个唯一周期
-        target_periods_cte = (
-            select(OperationsReport.period_start, OperationsReport.period_end)
-            .where(
-                OperationsReport.user_id == user_id,
-                OperationsReport.marketplace_id == marketplace_id,
-            )
-            .group_by(
-                OperationsReport.period_start, OperationsReport.period_end
-            )  # 去重
-            .order_by(desc(OperationsReport.period_start))  # 倒序
-            .limit(period_limit)  # 限制周期数量 (默认4)
-            .cte("target_periods")
+        result = await self.session.execute(
+            _flat_reports_stmt(),
+            {
+                "user_id": user_id,
+                "marketplace_id": marketplace_id,
+                "period_limit": period_limit,
+            },
         )
-
-        # 2. 主查询：Inner Join 这个 CTE
-        stmt = (
-            select(OperationsReport)
-            .options(
-                load_only(
-                    OperationsReport.id,
-                    OperationsReport.week,
-                    OperationsReport.ad_type,
-                    OperationsReport.period_start,
-                    OperationsReport.period_end,
-                    OperationsReport.report_type,
-                    OperationsReport.report_source,
-                    OperationsReport.pdf_path,
-                )
-            )
-            .join(
-                target_periods_cte,
-                (OperationsReport.period_start == target_periods_cte.c.period_start)
-                & (OperationsReport.period_end == target_periods_cte.c.period_end),
-            )
-            .where(
-                OperationsReport.user_id == user_id,
-                OperationsReport.marketplace_id == marketplace_id,
-            )
-            .order_by(desc(OperationsReport.period_start))
-        )
-
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return result.all()
 
     async def get_latest_report(
         self,
@@ -125,6 +263,62 @@ class OperationsLogRepository(
     运营日志仓储 (负责 ChangeLog 和 AuditLog)
     """
 
+    async def _fetch_page(
+        self,
+        model: type[_LogT],
+        filters: list[ColumnElement[bool]],
+        page: int,
+        page_size: int,
+        cursor: tuple[datetime, UUID] | None = None,
+    ) -> tuple[Sequence[_LogT], int]:
+        """
+        分页查询，并在同一结果集中带回总数 (单次往返)。
+        排序固定为 (created_at DESC, id DESC)，保证翻页稳定。
+
+        - cursor 为空: OFFSET 分页，总数取自 count(*) OVER ()；
+          页码越界 (结果为空) 时无法从窗口列获得总数，回退为单独 COUNT。
+        - cursor 非空: Keyset 分页 (created_at, id) < cursor，忽略 page，
+          任意深度均只扫描 page_size 行；总数以标量子查询统计全集。
+        """
+        order_by = (desc(model.created_at), desc(model.id))
+
+        if cursor is not None:
+            total_col = (
+                select(func.count())
+                .select_from(model)
+                .where(*filters)
+                .scalar_subquery()
+                .label("total")
+            )
+            # 游标值按列类型绑定 (created_at 为 timestamptz)
+            cursor_key = tuple_(
+                literal(cursor[0], model.created_at.type),
+                literal(cursor[1], model.id.type),
+            )
+            stmt = (
+                select(model, total_col)
+                .where(*filters, tuple_(model.created_at, model.id) < cursor_key)
+                .order_by(*order_by)
+                .limit(page_size)
+            )
+        else:
+            stmt = (
+                select(model, func.count().over().label("total"))
+                .where(*filters)
+                .order_by(*order_by)
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+            )
+        rows = (await self.session.execute(stmt)).all()
+        if rows:
+            return [row[0] for row in rows], rows[0].total
+
+        if page == 1 and cursor is None:
+            return [], 0
+        count_stmt = select(func.count()).select_from(model).where(*filters)
+        total = (await self.session.execute(count_stmt)).scalar() or 0
+        return [], total
+
     async def get_change_logs(
         self,
         user_id: str,
@@ -134,7 +328,8 @@ class OperationsLogRepository(
         category: str,
         page: int,
         page_size: int,
-    ) -> tuple[list[OperationsChangeLog], int]:
+        cursor: tuple[datetime, UUID] | None = None,
+    ) -> tuple[Sequence[OperationsChangeLog], int]:
         """
         分页获取三维变化记录
         """
@@ -147,22 +342,14 @@ class OperationsLogRepository(
             OperationsChangeLog.category == category,
         ]
 
-        # 2. 计算总数 (Count)
-        count_stmt = select(func.count()).where(*base_filters)
-        total = (await self.session.execute(count_stmt)).scalar() or 0
-
-        # 3. 分页查询 (Data)
-        stmt = (
-            select(OperationsChangeLog)
-            .where(*base_filters)
-            .order_by(desc(OperationsChangeLog.created_at))
-            .offset((page - 1) * page_size)
-            .limit(page_size)
+        # 2. 分页查询 + 总数 (单次往返)
+        return await self._fetch_page(
+            OperationsChangeLog,
+            base_filters,
+            page,
+            page_size,
+            cursor,
         )
-        result = await self.session.execute(stmt)
-        items = list(result.scalars().all())
-
-        return items, total
 
     async def get_audit_logs(
         self,
@@ -173,7 +360,8 @@ class OperationsLogRepository(
         category: str,
         page: int,
         page_size: int,
-    ) -> tuple[list[OperationsAuditLog], int]:
+        cursor: tuple[datetime, UUID] | None = None,
+    ) -> tuple[Sequence[OperationsAuditLog], int]:
         """
         分页获取操作审计日志
         """
@@ -186,22 +374,14 @@ class OperationsLogRepository(
             OperationsAuditLog.category == category,
         ]
 
-        # 2. 计算总数
-        count_stmt = select(func.count()).where(*base_filters)
-        total = (await self.session.execute(count_stmt)).scalar() or 0
-
-        # 3. 分页查询
-        stmt = (
-            select(OperationsAuditLog)
-            .where(*base_filters)
-            .order_by(desc(OperationsAuditLog.created_at))
-            .offset((page - 1) * page_size)
-            .limit(page_size)
+        # 2. 分页查询 + 总数 (单次往返)
+        return await self._fetch_page(
+            OperationsAuditLog,
+            base_filters,
+            page,
+            page_size,
+            cursor,
         )
-        result = await self.session.execute(stmt)
-        items = list(result.scalars().all())
-
-        return items, total
 
 
 class OperationsQARepository(BaseRepository[OperationsReportQA, BaseModel, BaseModel]):
@@ -209,49 +389,73 @@ class OperationsQARepository(BaseRepository[OperationsReportQA, BaseModel, BaseM
     运营问答仓储
     """
 
-    async def get_report_context(self, report_id: UUID) -> dict | None:
+    def __init__(self, session: AsyncSession):
+        # 模型固定为 OperationsReportQA，调用方只需注入会话 (便于后台任务以独立会话构造)
+        super().__init__(model=OperationsReportQA, session=session)
+
+    async def get_context_bundle(
+        self, report_id: UUID, current_qa_id: UUID, limit: int = 5
+    ) -> tuple[dict | None, list[tuple[str, str]]]:
         """
-        [RAG Core] 获取 RAG 所需的上下文数据 (mcp_data)。
+        [RAG Context] 单次往返同时获取 mcp_data 与最近 N 轮历史对话。
+
+        Returns:
+            (mcp_data, [(question, answer), ...])，历史按时间正序 (旧 -> 新)
         """
-        stmt = select(OperationsReport.mcp_data).where(OperationsReport.id == report_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        result = await self.session.execute(
+            _context_bundle_stmt(),
+            {"report_id": report_id, "current_qa_id": current_qa_id, "limit": limit},
+        )
+        row = result.one()
+        history = [(q, a) for q, a in row.history or ()]
+        return row.mcp_data, history
+
+    async def has_report_context(self, report_id: UUID) -> bool:
+        """
+        [Fail Fast] 仅判断报告是否存在可用的 mcp_data。
+        用于 init_chat 校验，避免为一次存在性判断拉取整个 JSONB 文档。
+        """
+        result = await self.session.execute(
+            _REPORT_CONTEXT_EXISTS_STMT, {"report_id": report_id}
+        )
+        return bool(result.scalar())
 
     async def get_qa_by_id(self, qa_id: UUID) -> OperationsReportQA | None:
         """
         获取单条问答记录。
         """
-        stmt = select(OperationsReportQA).where(OperationsReportQA.id == qa_id)
-        result = await self.session.execute(stmt)
+        result = await self.session.execute(_QA_BY_ID_STMT, {"qa_id": qa_id})
         return result.scalar_one_or_none()
 
     async def create_qa_record(
         self, user_id: str, marketplace_id: str, report_id: UUID, question: str
-    ) -> OperationsReportQA:
+    ) -> UUID:
         """
         创建一条初始状态(PENDING)的问答记录。
+        使用 INSERT ... RETURNING 在一次往返中拿到主键，无需 refresh。
         """
-        qa_record = OperationsReportQA(
-            user_id=user_id,
-            marketplace_id=marketplace_id,
-            report_id=report_id,
-            question=question,
-            status="PENDING",
-            answer=None,
+        stmt = (
+            insert(OperationsReportQA)
+            .values(
+                user_id=user_id,
+                marketplace_id=marketplace_id,
+                report_id=report_id,
+                question=question,
+                status="PENDING",
+                answer=None,
+            )
+            .returning(OperationsReportQA.id)
         )
-        self.session.add(qa_record)
-        return qa_record
+        result = await self.session.execute(stmt)
+        return result.scalar_one()
 
     async def update_status(self, qa_id: UUID, status: str) -> None:
         """
         仅更新状态。
         """
-        stmt = (
-            update(OperationsReportQA)
-            .where(OperationsReportQA.id == qa_id)
-            .values(status=status)
+        await self.session.execute(
+            _UPDATE_STATUS_STMT, {"qa_id": qa_id, "new_status": status}
         )
-        await self.session.execute(stmt)
 
     async def update_answer(self, qa_id: UUID, answer: str, status: str) -> None:
         """
@@ -264,42 +468,37 @@ class OperationsQARepository(BaseRepository[OperationsReportQA, BaseModel, BaseM
         )
         await self.session.execute(stmt)
 
-    async def get_chat_history(
-        self, user_id: str, marketplace_id: str, report_id: UUID
-    ) -> list[OperationsReportQA]:
+    async def stream_chat_history(
+        self,
+        user_id: str,
+        marketplace_id: str,
+        report_id: UUID,
+        batch_size: int = 128,
+    ) -> AsyncIterator[Sequence[OperationsReportQA]]:
         """
-        获取指定报告的对话历史，按时间正序排列。
+        以服务端游标分批读取对话历史 (按时间正序)。
+        内存占用为 O(batch_size)，首批数据到达即可开始序列化。
         """
-        stmt = (
-            select(OperationsReportQA)
-            .where(
-                OperationsReportQA.report_id == report_id,
-                OperationsReportQA.user_id == user_id,
-                OperationsReportQA.marketplace_id == marketplace_id,
-            )
-            .order_by(asc(OperationsReportQA.created_at))
+        stmt = _chat_history_stmt(user_id, marketplace_id, report_id)
+        result = await self.session.stream(
+            stmt, execution_options={"yield_per": batch_size}
         )
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        async for partition in result.scalars().partitions():
+            yield partition
 
     async def get_recent_history(
         self, report_id: UUID, current_qa_id: UUID, limit: int = 5
-    ) -> list[OperationsReportQA]:
+    ) -> Sequence[Row[tuple[str, str]]]:
         """
         [RAG Context] 获取当前对话之前的最近 N 条历史记录。
         用于构建 LLM 的 Multi-turn Context。
+        结果已在 SQL 中按时间正序排列 (旧 -> 新)，符合 LLM 阅读习惯。
+
+        Returns:
+            Sequence[Row]: (question, answer) 行
         """
-        stmt = (
-            select(OperationsReportQA)
-            .where(
-                OperationsReportQA.report_id == report_id,
-                OperationsReportQA.id != current_qa_id,  # 排除当前这条
-                OperationsReportQA.status == "COMPLETED",  # 必须是已完成的
-                OperationsReportQA.answer.is_not(None),  # 必须有回答
-            )
-            .order_by(desc(OperationsReportQA.created_at))  # 倒序取最近的
-            .limit(limit)
+        result = await self.session.execute(
+            _recent_history_stmt(),
+            {"report_id": report_id, "current_qa_id": current_qa_id, "limit": limit},
         )
-        result = await self.session.execute(stmt)
-        # 翻转为正序 (时间轴: 旧 -> 新)，符合 LLM 阅读习惯
-        return list(reversed(list(result.scalars().all())))
+        return result.all()
@@ -15,7 +15,8 @@ from typing import Annotated
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
 
 from app.api.deps import DBSession
 from app.core.response import ResponseModel
@@ -46,6 +47,9 @@ from app.domains.operations.service import (
 
 router = APIRouter()
 
+# 对话历史序列化器 (模块级构建一次)
+_CHAT_RECORDS_ADAPTER = TypeAdapter(list[ChatRecordItem])
+
 
 # ------------------------------------------------------------------------------
 # Dependencies
@@ -61,7 +65,7 @@ async def get_log_service(session: DBSession) -> OperationsLogService:
 
 
 async def get_qa_service(session: DBSession) -> OperationsQAService:
-    repo = OperationsQARepository(model=None, session=session)  # type: ignore
+    repo = OperationsQARepository(session)
     return OperationsQAService(repo)
 
 
@@ -184,6 +188,8 @@ async def stream_chat_answer(
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            # 禁止中间件对流式响应做压缩，保证逐帧直达客户端
+            "Content-Encoding": "identity",
         },
     )
 
@@ -197,8 +203,12 @@ async def get_chat_history_list(
     request: Request,
     req_data: ChatHistoryRequest,
     service: QAServiceDep,
-) -> ResponseModel[list[ChatRecordItem]]:
-    data = await service.get_chat_history(req_data)
-    return ResponseModel.success(
-        data=data, request_id=getattr(request.state, "request_id", None)
+) -> Response:
+    """
+    响应信封与列表项按批流式输出，长会话不会一次性加载全部记录 (短会话直接返回完整响应)。
+    """
+    return await ResponseModel.stream_list_response(
+        service.iter_chat_history(req_data),
+        _CHAT_RECORDS_ADAPTER,
+        request_id=getattr(request.state, "request_id", None),
     )
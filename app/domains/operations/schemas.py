@@ -8,6 +8,8 @@ Description: 运营领域 Pydantic 模型
 3. 三维变化与审计日志分页查询 (ChangeLog/AuditLog)
 4. 智能问答交互 (ChatInitRequest, ChatRecordItem)
 
+注意: 响应模型 (ORM -> 出参) 均为只读: frozen=True 禁止构建后修改，extra="ignore" 忽略多余字段。
+
 Author: jinmozhe
 Created: 2026-02-12
 """
@@ -47,7 +49,7 @@ class OperationsReportItem(BaseModel):
     report_source: str = Field(..., description="报告来源")
     pdf_path: str | None = Field(default=None, description="PDF文件路径")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 # ==============================================================================
@@ -87,7 +89,7 @@ class LatestReportResponse(BaseModel):
     kpi: dict[str, Any] = Field(..., description="关键绩效指标数据")
     diagnosis: dict[str, Any] = Field(..., description="全域诊断看板数据")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 # ==============================================================================
@@ -107,6 +109,10 @@ class BaseLogListRequest(BaseModel):
     category: str = Field(..., description="分类 (Risk, Executed...)")
     page: int = Field(default=1, ge=1, description="页码")
     page_size: int = Field(default=5, ge=1, le=100, description="每页条数")
+    cursor: tuple[datetime, UUID] | None = Field(
+        default=None,
+        description="游标 [created_at, id]，传入上一页返回的 next_cursor 时按游标翻页 (忽略 page)",
+    )
 
 
 # --- Change Log ---
@@ -126,7 +132,7 @@ class ChangeLogItem(BaseModel):
     content: dict[str, Any] = Field(..., description="变化详情 (JSON)")
     created_at: datetime = Field(..., description="记录时间")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 class ChangeLogListResponse(BaseModel):
@@ -136,6 +142,9 @@ class ChangeLogListResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: tuple[datetime, UUID] | None = Field(
+        default=None, description="下一页游标 (无更多数据时为 null)"
+    )
 
 
 # --- Audit Log ---
@@ -155,7 +164,7 @@ class AuditLogItem(BaseModel):
     content: dict[str, Any] = Field(..., description="日志详情 (JSON)")
     created_at: datetime = Field(..., description="日志时间")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 class AuditLogListResponse(BaseModel):
@@ -165,6 +174,9 @@ class AuditLogListResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: tuple[datetime, UUID] | None = Field(
+        default=None, description="下一页游标 (无更多数据时为 null)"
+    )
 
 
 # ==============================================================================
@@ -212,4 +224,4 @@ class ChatRecordItem(BaseModel):
     status: str = Field(..., description="状态: PENDING/GENERATING/COMPLETED/FAILED")
     created_at: datetime = Field(..., description="提问时间")
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
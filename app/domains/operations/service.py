@@ -11,16 +11,25 @@ Author: jinmozhe
 Created: 2026-02-12
 """
 
-import json
-from collections.abc import AsyncGenerator
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable, Sequence
+from datetime import datetime
+from io import StringIO
 from uuid import UUID
 
+import httpx
+import orjson
+from cachetools import TTLCache
 from loguru import logger
-from openai import APIError, AsyncOpenAI
-from openai.types.chat import ChatCompletionMessageParam
+from openai import APIError
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessageParam
+from pydantic import TypeAdapter
 
 from app.core.config import settings
 from app.core.exceptions import AppException
+from app.core.llm import get_llm_client, trim_history
+from app.core.tasks import QAStatusTracker
+from app.db.models.operations_report import OperationsAuditLog, OperationsChangeLog
 from app.domains.operations.constants import OperationsErrorCode
 from app.domains.operations.repository import (
     OperationsLogRepository,
@@ -43,6 +52,61 @@ from app.domains.operations.schemas import (
     OperationsReportItem,
 )
 
+# SSE 字节帧片段 (media_type 仍为 text/event-stream，帧内容为 UTF-8)
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+# LLM 生产者与 SSE 消费者之间的有界队列容量 (按 Token 计)
+_LLM_QUEUE_SIZE = 64
+
+# SSE 合帧策略：待发文本累计 32 个字符或等待超过 20ms 即合并为一帧发送
+_SSE_FLUSH_CHARS = 32
+_SSE_FLUSH_INTERVAL = 0.02
+
+# RAG 系统提示词 (模块级常量)
+_SYSTEM_PROMPT = (
+    "你是一个专业的电商运营专家。请根据提供的 JSON 数据（运营诊断报告）"
+    "回答用户的问题。\n"
+    "要求：\n"
+    "1. 重点关注全域诊断、三维变化和审计日志中的关键信息。\n"
+    "2. 回答风格专业、客观、行动导向。\n"
+    "3. 使用 Markdown 格式。\n"
+    "4. 如果数据中没有相关信息，请明确说明，不要编造。"
+)
+_SYSTEM_PROMPT_PREFIX = _SYSTEM_PROMPT + "\n\n数据:\n"
+
+# 报告上下文缓存 (report_id -> 已拼接好的完整 System Message: 提示词 + mcp_data JSON)
+# 同一会话的追问无需重复加载 JSONB 与序列化；报告数据由离线任务写入，TTL 到期后自然刷新
+_CONTEXT_CACHE: TTLCache[UUID, str] = TTLCache(maxsize=1024, ttl=600)
+
+# 列表校验器 (模块级构建一次，核心 Schema 仅编译一次)
+_REPORT_ITEMS_ADAPTER = TypeAdapter(list[OperationsReportItem])
+_CHANGE_LOG_ITEMS_ADAPTER = TypeAdapter(list[ChangeLogItem])
+_AUDIT_LOG_ITEMS_ADAPTER = TypeAdapter(list[AuditLogItem])
+
+# 问答记录 DTO 字段名 (模块加载时计算一次)
+_CHAT_RECORD_FIELDS = tuple(ChatRecordItem.model_fields)
+
+
+def _content_frame(text: str) -> bytes:
+    """
+    辅助: 构造 SSE content 帧 (直接拼接字节)
+    """
+    return _SSE_PREFIX + orjson.dumps({"content": text}) + _SSE_SUFFIX
+
+
+def _next_cursor(
+    items: Sequence[OperationsChangeLog | OperationsAuditLog], page_size: int
+) -> tuple[datetime, UUID] | None:
+    """
+    辅助: 满页时以末条记录的 (created_at, id) 作为下一页游标
+    """
+    if len(items) < page_size:
+        return None
+    last = items[-1]
+    return last.created_at, last.id
+
 
 class OperationsReportService:
     """
@@ -60,7 +124,8 @@ class OperationsReportService:
         """
         # [Business Rule] 获取最近的4个周期数据
         rows = await self.repo.get_flat_reports(user_id, marketplace_id, period_limit=4)
-        return [OperationsReportItem.model_validate(row) for row in rows]
+        # 整表单次校验 (pydantic-core 内完成列表遍历)
+        return _REPORT_ITEMS_ADAPTER.validate_python(rows, from_attributes=True)
 
     async def get_latest_report(
         self, req: LatestReportRequest
@@ -100,13 +165,17 @@ class OperationsLogService:
             category=req.category,
             page=req.page,
             page_size=req.page_size,
+            cursor=req.cursor,
         )
 
         return ChangeLogListResponse(
-            items=[ChangeLogItem.model_validate(item) for item in items],
+            items=_CHANGE_LOG_ITEMS_ADAPTER.validate_python(
+                items, from_attributes=True
+            ),
             total=total,
             page=req.page,
             page_size=req.page_size,
+            next_cursor=_next_cursor(items, req.page_size),
         )
 
     async def get_audit_logs(self, req: AuditLogListRequest) -> AuditLogListResponse:
@@ -121,13 +190,15 @@ class OperationsLogService:
             category=req.category,
             page=req.page,
             page_size=req.page_size,
+            cursor=req.cursor,
         )
 
         return AuditLogListResponse(
-            items=[AuditLogItem.model_validate(item) for item in items],
+            items=_AUDIT_LOG_ITEMS_ADAPTER.validate_python(items, from_attributes=True),
             total=total,
             page=req.page,
             page_size=req.page_size,
+            next_cursor=_next_cursor(items, req.page_size),
         )
 
 
@@ -138,26 +209,23 @@ class OperationsQAService:
 
     def __init__(self, repo: OperationsQARepository):
         self.repo = repo
-        # 初始化 LLM 客户端
-        self.llm_client = AsyncOpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL,
-            timeout=60.0,
-            max_retries=2,
-        )
+        # 复用全局 LLM 客户端 (共享连接池，免去每请求的 TCP/TLS 握手)
+        self.llm_client = get_llm_client()
 
     async def init_chat(self, req: ChatInitRequest) -> ChatInitResponse:
         """
         第一步：初始化对话
         """
         # 1. 校验报告是否存在 (Fail Fast)
-        # 仅检查是否存在 mcp_data (作为 RAG 上下文)
-        mcp_data = await self.repo.get_report_context(req.report_id)
-        if not mcp_data:
+        # 优先命中上下文缓存，否则 EXISTS 判断，不拉取 mcp_data
+        if (
+            req.report_id not in _CONTEXT_CACHE
+            and not await self.repo.has_report_context(req.report_id)
+        ):
             raise AppException(OperationsErrorCode.REPORT_CONTEXT_MISSING)
 
-        # 2. 创建 QA 记录 (PENDING)
-        qa_record = await self.repo.create_qa_record(
+        # 2. 创建 QA 记录 (PENDING)，INSERT ... RETURNING 直接拿到 ID
+        qa_id = await self.repo.create_qa_record(
             user_id=req.user_id,
             marketplace_id=req.marketplace_id,
             report_id=req.report_id,
@@ -166,66 +234,66 @@ class OperationsQAService:
 
         # 3. 提交事务
         await self.repo.session.commit()
-        await self.repo.session.refresh(qa_record)
 
-        return ChatInitResponse(qa_id=qa_record.id)
+        return ChatInitResponse(qa_id=qa_id)
 
-    async def stream_answer_generator(self, qa_id: UUID) -> AsyncGenerator[str, None]:
+    async def stream_answer_generator(self, qa_id: UUID) -> AsyncGenerator[bytes, None]:
         """
         第二步：流式生成答案 (Async Generator)
         """
         # 1. 获取 QA 记录
         qa_record = await self.repo.get_qa_by_id(qa_id)
         if not qa_record:
-            yield "data: [ERROR] Session not found\n\n"
+            yield b"data: [ERROR] Session not found\n\n"
             return
 
-        # 2. 获取上下文 (mcp_data Only)
-        mcp_data = await self.repo.get_report_context(qa_record.report_id)
-        if not mcp_data:
-            yield "data: [ERROR] Report context data missing\n\n"
-            return
-
-        # 3. 更新状态: GENERATING
-        await self.repo.update_status(qa_id, "GENERATING")
-        await self.repo.session.commit()
+        # 2. 获取上下文 (mcp_data + 最近 5 轮历史)
+        system_message = _CONTEXT_CACHE.get(qa_record.report_id)
+        if system_message is not None:
+            # 缓存命中: 仅查询历史记录
+            # 行即 (question, answer) 元组，可直接迭代解包
+            history = await self.repo.get_recent_history(
+                report_id=qa_record.report_id, current_qa_id=qa_id, limit=5
+            )
+        else:
+            # 缓存未命中: mcp_data 与历史单次查询，序列化后写入缓存
+            mcp_data, history = await self.repo.get_context_bundle(
+                report_id=qa_record.report_id, current_qa_id=qa_id, limit=5
+            )
+            if not mcp_data:
+                yield b"data: [ERROR] Report context data missing\n\n"
+                return
+            # orjson 原生输出 UTF-8 (等价 ensure_ascii=False)，大文档序列化远快于标准库
+            system_message = _SYSTEM_PROMPT_PREFIX + orjson.dumps(mcp_data).decode(
+                "utf-8"
+            )
+            _CONTEXT_CACHE[qa_record.report_id] = system_message
 
-        # 4. 构建 System Prompt
-        # 直接序列化 mcp_data
-        context_str = json.dumps(mcp_data, ensure_ascii=False)
-
-        system_prompt = (
-            "你是一个专业的电商运营专家。请根据提供的 JSON 数据（运营诊断报告）"
-            "回答用户的问题。\n"
-            "要求：\n"
-            "1. 重点关注全域诊断、三维变化和审计日志中的关键信息。\n"
-            "2. 回答风格专业、客观、行动导向。\n"
-            "3. 使用 Markdown 格式。\n"
-            "4. 如果数据中没有相关信息，请明确说明，不要编造。"
-        )
+        # 3. 更新状态: GENERATING (后台独立会话提交，不阻塞 LLM 调用)
+        # 终态回写前会先等待该任务完成，保证 GENERATING 不会覆盖终态
+        status = QAStatusTracker.start(OperationsQARepository, qa_id, name="operations")
+        # 结束只读事务并归还连接，LLM 流式生成期间本会话不占用连接
+        await self.repo.session.close()
 
-        # A. 基础系统消息
+        # 4. 构建消息链
+        # A. 基础系统消息 (直接复用缓存中的完整字符串)
         messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": f"{system_prompt}\n\n数据:\n{context_str}"}
+            {"role": "system", "content": system_message}
         ]
 
-        # B. 注入历史记录 (Sliding Window Strategy)
-        # 限制最近 5 条
-        history_records = await self.repo.get_recent_history(
-            report_id=qa_record.report_id,
-            current_qa_id=qa_id,
-            limit=5,
-        )
-
-        for record in history_records:
-            if record.question and record.answer:
-                messages.append({"role": "user", "content": record.question})
-                messages.append({"role": "assistant", "content": record.answer})
+        # B. 注入历史记录 (Sliding Window Strategy，已在步骤 2 中取得)
+        # 按 Token 预算裁剪，超长回答不会成倍放大 Prompt，优先保留最近轮次
+        for question, answer in trim_history(
+            history, settings.LLM_HISTORY_TOKEN_BUDGET
+        ):
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
 
         # C. 追加当前用户问题
         messages.append({"role": "user", "content": qa_record.question})
 
-        full_answer_buffer = []
+        # 完整回答累积 (StringIO 就地追加，结束时一次性取值)
+        answer_buf = StringIO()
 
         try:
             # 5. 调用 LLM
@@ -236,49 +304,125 @@ class OperationsQAService:
                 temperature=0.3,
             )
 
-            async for chunk in stream:
-                delta = chunk.choices[0].delta
-                content = delta.content
+            # 生产者任务独立拉取 LLM 流写入有界队列，客户端/代理短暂背压时
+            # 上游读取不随之停顿；队列写满 (_LLM_QUEUE_SIZE) 后才反压生产者
+            queue: asyncio.Queue[str | BaseException | None] = asyncio.Queue(
+                maxsize=_LLM_QUEUE_SIZE
+            )
+            producer = asyncio.create_task(
+                self._pump_llm(stream, queue, answer_buf),
+                name=f"operations-llm-{qa_id}",
+            )
 
-                if content:
-                    full_answer_buffer.append(content)
-                    # SSE 格式推送
-                    yield f"data: {json.dumps({'content': content}, ensure_ascii=False)}\n\n"
+            # 消费队列并合帧推送：待发文本满 _SSE_FLUSH_CHARS 个字符，
+            # 或首段待发文本等待超过 _SSE_FLUSH_INTERVAL (LLM 停顿时同样生效) 即刷出
+            loop = asyncio.get_running_loop()
+            batch: list[str] = []
+            batch_chars = 0
+            batch_started = 0.0
+            next_item = asyncio.ensure_future(queue.get())
+            try:
+                while True:
+                    if batch:
+                        timeout = batch_started + _SSE_FLUSH_INTERVAL - loop.time()
+                        done, _ = await asyncio.wait(
+                            {next_item}, timeout=max(timeout, 0)
+                        )
+                        if not done:
+                            yield _content_frame("".join(batch))
+                            batch.clear()
+                            batch_chars = 0
+                            continue
+                    item = await next_item
+                    if item is None:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    next_item = asyncio.ensure_future(queue.get())
+
+                    if not batch:
+                        batch_started = loop.time()
+                    batch.append(item)
+                    batch_chars += len(item)
+                    if batch_chars >= _SSE_FLUSH_CHARS:
+                        yield _content_frame("".join(batch))
+                        batch.clear()
+                        batch_chars = 0
+
+                # 刷出剩余文本
+                if batch:
+                    yield _content_frame("".join(batch))
+            finally:
+                # 客户端断开或异常退出时，停止生产者与尚未完成的读取
+                next_item.cancel()
+                producer.cancel()
 
             # 6. [闭环] 更新数据库
-            final_answer = "".join(full_answer_buffer)
-            await self.repo.update_answer(qa_id, final_answer, "COMPLETED")
+            await status.generating
+            await self.repo.update_answer(qa_id, answer_buf.getvalue(), "COMPLETED")
             await self.repo.session.commit()
+            status.settled = True
 
-            yield "data: [DONE]\n\n"
+            yield _SSE_DONE
 
-        except APIError as e:
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开: 任务取消 (CancelledError) 或 Starlette 关闭生成器 (GeneratorExit)
+            # 均不可吞掉，FAILED 回写由下方 finally 兜底
+            logger.info(f"Stream cancelled for qa_id={qa_id}")
+            raise
+
+        except (APIError, httpx.HTTPError) as e:
+            # LLM 调用链路错误 (SDK 异常或流式读取中断)
             logger.error(f"LLM API Error for qa_id={qa_id}: {e}")
-            yield f"data: [ERROR] AI Service Error: {e.message}\n\n"
-            await self._handle_failure(qa_id)
+            message = e.message if isinstance(e, APIError) else str(e)
+            yield f"data: [ERROR] AI Service Error: {message}\n\n".encode()
+            await status.fail(self.repo)
 
         except Exception as e:  # noqa: BLE001
             logger.error(f"Stream failed for qa_id={qa_id}: {e}")
-            yield f"data: [ERROR] System Error: {str(e)}\n\n"
-            await self._handle_failure(qa_id)
-
-    async def _handle_failure(self, qa_id: UUID) -> None:
+            yield f"data: [ERROR] System Error: {str(e)}\n\n".encode()
+            await status.fail(self.repo)
+
+        finally:
+            # 未写入终态即退出时，由独立会话在后台回写 FAILED
+            status.close()
+
+    @staticmethod
+    async def _pump_llm(
+        stream: AsyncIterable[ChatCompletionChunk],
+        queue: asyncio.Queue[str | BaseException | None],
+        answer_buf: StringIO,
+    ) -> None:
         """
-        辅助: 失败状态回写
+        辅助: LLM 流生产者。
+        逐块写入队列并同步累积完整回答；结束写入 None，异常作为队列元素转交消费者抛出。
         """
         try:
-            await self.repo.update_status(qa_id, "FAILED")
-            await self.repo.session.commit()
-        except Exception as db_e:  # noqa: BLE001
-            logger.error(f"Failed to update DB status for qa_id={qa_id}: {db_e}")
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content
+                if content:
+                    answer_buf.write(content)
+                    await queue.put(content)
+        except Exception as e:  # noqa: BLE001
+            await queue.put(e)
+            return
+        await queue.put(None)
 
-    async def get_chat_history(self, req: ChatHistoryRequest) -> list[ChatRecordItem]:
+    async def iter_chat_history(
+        self, req: ChatHistoryRequest
+    ) -> AsyncGenerator[list[ChatRecordItem], None]:
         """
-        获取对话历史
+        分批获取对话历史 (服务端游标，每批 128 条)
+        ORM 行来自本库查询，类型已由列定义保证，使用 model_construct 跳过重复校验
         """
-        rows = await self.repo.get_chat_history(
+        async for rows in self.repo.stream_chat_history(
             user_id=req.user_id,
             marketplace_id=req.marketplace_id,
             report_id=req.report_id,
-        )
-        return [ChatRecordItem.model_validate(row) for row in rows]
+        ):
+            yield [
+                ChatRecordItem.model_construct(
+                    **{f: getattr(row, f) for f in _CHAT_RECORD_FIELDS}
+                )
+                for row in rows
+            ]
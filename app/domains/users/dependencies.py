@@ -21,7 +21,6 @@ from fastapi import Depends
 
 # 1. 导入全局 DBSession 别名 (注意没有空格)
 from app.api.deps import DBSession
-from app.db.models.user import User
 from app.domains.users.repository import UserRepository
 from app.domains.users.service import UserService
 
@@ -31,7 +30,7 @@ async def get_user_repository(session: DBSession) -> UserRepository:
     获取用户仓储实例 (UserRepository)。
     使用全局 DBSession (Annotated[AsyncSession, ...]) 自动处理 DB 连接。
     """
-    return UserRepository(model=User, session=session)
+    return UserRepository(session=session)
 
 
 # 定义中间别名，方便下方函数使用 (可选，也可以直接写 Depends)
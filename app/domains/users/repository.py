@@ -5,19 +5,39 @@ Description: 用户领域仓储层 (Repository)
 本模块负责用户数据的数据库访问，继承自通用 BaseRepository。
 扩展功能：
 1. get_by_phone_number: 根据手机号查询 (自动过滤软删除)
-2. get_by_email: 根据邮箱查询 (自动过滤软删除)
-3. get_by_username: 根据用户名查询 (自动过滤软删除)
+2. find_collisions: 单次查询检测手机号/邮箱/用户名的占用情况
 
 Author: jinmozhe
 Created: 2025-11-25
 """
 
-from sqlalchemy import select
+from functools import lru_cache
+
+from sqlalchemy import Select, bindparam, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.user import User
 from app.db.repositories.base import BaseRepository
 from app.domains.users.schemas import UserCreate, UserUpdate
 
+# 凭证查询语句 (模块加载时构建一次，参数均为 bindparam，编译结果由语句缓存复用)
+# 登录/注册热路径每次调用不再重新构造表达式树
+_BY_PHONE_NUMBER_STMT = select(User).where(
+    User.phone_number == bindparam("phone_number"), User.is_deleted.is_(False)
+)
+
+
+@lru_cache(maxsize=4)
+def _collisions_stmt(fields: tuple[str, ...]) -> Select:
+    """
+    构建 find_collisions 的查询语句 (按参与比对的字段组合缓存)。
+    字段值均为 bindparam；注册时手机号必填，邮箱/用户名可选，共 4 种组合，每种仅构建一次。
+    """
+    return select(User.phone_number, User.email, User.username).where(
+        or_(*(getattr(User, field) == bindparam(field) for field in fields)),
+        User.is_deleted.is_(False),
+    )
+
 
 class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
     """
@@ -29,29 +49,48 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
     如果业务场景需要查询"已注销"用户，请另行实现类似 get_with_deleted_by_xxx 的方法。
     """
 
+    def __init__(self, session: AsyncSession):
+        # 模型固定为 User，调用方只需注入会话
+        super().__init__(model=User, session=session)
+
     async def get_by_phone_number(self, phone_number: str) -> User | None:
         """
         根据手机号查询有效用户。
         """
-        stmt = select(User).where(
-            User.phone_number == phone_number, User.is_deleted.is_(False)
-        )
         # 使用 scalar_one_or_none 以确保数据唯一性 (如果有脏数据导致多条，会抛错)
-        result = await self.session.execute(stmt)
+        result = await self.session.execute(
+            _BY_PHONE_NUMBER_STMT, {"phone_number": phone_number}
+        )
         return result.scalar_one_or_none()
 
-    async def get_by_email(self, email: str) -> User | None:
+    async def find_collisions(
+        self,
+        phone_number: str | None = None,
+        email: str | None = None,
+        username: str | None = None,
+    ) -> set[str]:
         """
-        根据邮箱查询有效用户。
-        """
-        stmt = select(User).where(User.email == email, User.is_deleted.is_(False))
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        单次查询检测唯一字段是否已被其他有效用户占用。
+        代替逐字段查询的多次往返。
 
-    async def get_by_username(self, username: str) -> User | None:
+        Returns:
+            set[str]: 发生冲突的字段名集合 (phone_number / email / username)
         """
-        根据用户名查询有效用户。
-        """
-        stmt = select(User).where(User.username == username, User.is_deleted.is_(False))
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        candidates = {
+            "phone_number": phone_number,
+            "email": email,
+            "username": username,
+        }
+        params: dict[str, object] = {
+            field: value for field, value in candidates.items() if value is not None
+        }
+        if not params:
+            return set()
+
+        result = await self.session.execute(_collisions_stmt(tuple(params)), params)
+        collisions: set[str] = set()
+        for row in result:
+            for field, value in candidates.items():
+                if value is not None and getattr(row, field) == value:
+                    collisions.add(field)
+        return collisions
@@ -28,7 +28,8 @@ from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 # ------------------------------------------------------------------------------
 
 # E.164 手机号正则：以 + 开头，后接 8-15 位数字
-E164_PATTERN = re.compile(r"^\+\d{8,15}$")
+# \A...\Z 严格锚定整串 (`$` 会放过尾随换行)，校验统一使用 fullmatch
+E164_PATTERN = re.compile(r"\A\+\d{8,15}\Z")
 E164_ERROR_MESSAGE = "手机号必须符合 E.164 格式 (例如 +8613800000000)"
 
 
@@ -60,7 +61,7 @@ class UserBase(BaseModel):
     @classmethod
     def validate_e164(cls, v: str) -> str:
         """验证手机号是否符合 E.164 格式"""
-        if not E164_PATTERN.match(v):
+        if E164_PATTERN.fullmatch(v) is None:
             raise ValueError(E164_ERROR_MESSAGE)
         return v
 
@@ -101,7 +102,7 @@ class UserUpdate(BaseModel):
     def validate_e164(cls, v: str | None) -> str | None:
         if v is None:
             return None
-        if not E164_PATTERN.match(v):
+        if E164_PATTERN.fullmatch(v) is None:
             raise ValueError(E164_ERROR_MESSAGE)
         return v
 
@@ -3,9 +3,9 @@ File: app/domains/users/service.py
 Description: 用户领域服务 (业务逻辑层)
 
 本模块封装用户管理的核心业务逻辑：
-1. 用户注册 (创建)：校验唯一性、哈希密码、写入数据库。
+1. 用户注册 (创建)：校验唯一性、哈希密码、写入数据库 (唯一约束兜底并发冲突)。
 2. 用户查询：通过 ID 获取用户 (自动过滤软删除)。
-3. 用户更新：处理密码哈希、变更唯一性校验。
+3. 用户更新：处理密码哈希、依赖唯一约束的乐观唯一性校验。
 4. 异常处理：抛出业务特定的 AppException (配合 UserErrorCode)。
 
 Author: jinmozhe
@@ -15,6 +15,8 @@ Updated: 2026-02-02 (Fix ErrorCodes & Strict Mode)
 
 from uuid import UUID
 
+from sqlalchemy.exc import IntegrityError
+
 from app.core.exceptions import AppException, NotFoundException
 from app.core.logging import logger
 from app.core.security import get_password_hash_async
@@ -23,6 +25,44 @@ from app.domains.users.constants import UserErrorCode  # ✅ 新增依赖
 from app.domains.users.repository import UserRepository
 from app.domains.users.schemas import UserCreate, UserUpdate
 
+# 唯一字段冲突 -> 错误码 (按校验优先级排列)
+_COLLISION_ERRORS = (
+    ("phone_number", UserErrorCode.PHONE_EXIST),
+    ("email", UserErrorCode.EMAIL_EXIST),
+    ("username", UserErrorCode.USERNAME_EXIST),
+)
+
+
+# 唯一约束名 -> 错误码 (约束名由 Base.metadata 命名规范生成: uq_<table>_<column>)
+_UNIQUE_CONSTRAINT_ERRORS = {
+    f"uq_users_{field}": error_code for field, error_code in _COLLISION_ERRORS
+}
+
+
+def _unique_violation_error(exc: IntegrityError) -> UserErrorCode | None:
+    """
+    辅助: 从唯一约束冲突中解析出对应的业务错误码，无法识别时返回 None
+    """
+    # asyncpg 的原始异常挂在 DBAPI 适配异常的 __cause__ 上，携带 constraint_name
+    constraint = getattr(exc.orig.__cause__, "constraint_name", None)
+    if constraint in _UNIQUE_CONSTRAINT_ERRORS:
+        return _UNIQUE_CONSTRAINT_ERRORS[constraint]
+    # 兜底: 按错误信息匹配约束名
+    message = str(exc.orig)
+    for name, error_code in _UNIQUE_CONSTRAINT_ERRORS.items():
+        if name in message:
+            return error_code
+    return None
+
+
+def _raise_on_collision(collisions: set[str]) -> None:
+    """
+    辅助: 存在冲突字段时，按优先级抛出对应的业务异常
+    """
+    for field, error_code in _COLLISION_ERRORS:
+        if field in collisions:
+            raise AppException(error_code)
+
 
 class UserService:
     """
@@ -36,16 +76,13 @@ class UserService:
         """
         创建新用户 (注册)。
         """
-        # 1. 唯一性校验 (Fail Fast)
-        if await self.repo.get_by_phone_number(obj_in.phone_number):
-            # ✅ 修正：使用枚举，抛弃 code=40001
-            raise AppException(UserErrorCode.PHONE_EXIST)
-
-        if obj_in.email and await self.repo.get_by_email(obj_in.email):
-            raise AppException(UserErrorCode.EMAIL_EXIST)
-
-        if obj_in.username and await self.repo.get_by_username(obj_in.username):
-            raise AppException(UserErrorCode.USERNAME_EXIST)
+        # 1. 唯一性校验 (Fail Fast，单次查询)
+        collisions = await self.repo.find_collisions(
+            phone_number=obj_in.phone_number,
+            email=obj_in.email or None,
+            username=obj_in.username or None,
+        )
+        _raise_on_collision(collisions)
 
         # 2. 密码加密 (使用异步版本，避免阻塞事件循环)
         hashed_password = await get_password_hash_async(obj_in.password)
@@ -56,10 +93,17 @@ class UserService:
         user = User(**user_data, hashed_password=hashed_password)
 
         # 4. 持久化与事务提交 (Service 层负责事务边界)
+        # 主键与默认值均在 Python 侧生成，commit 后实例状态完整，无需 refresh 回查
+        # 预检查与 INSERT 之间的并发注册 (或软删除用户仍占用唯一值) 由唯一约束兜底
         self.repo.session.add(user)
-        await self.repo.session.flush()
-        await self.repo.session.commit()
-        await self.repo.session.refresh(user)
+        try:
+            await self.repo.session.commit()
+        except IntegrityError as e:
+            await self.repo.session.rollback()
+            error_code = _unique_violation_error(e)
+            if error_code is None:
+                raise
+            raise AppException(error_code) from e
 
         logger.bind(user_id=str(user.id)).info("User created successfully")
 
@@ -94,36 +138,20 @@ class UserService:
             hashed_password = await get_password_hash_async(new_password)
             user.hashed_password = hashed_password
 
-        # 2. 处理唯一性字段变更 (防止冲突)
-        # 逻辑：如果字段存在于更新数据中，且值发生了变化，则检查数据库是否已存在该值
-
-        if (
-            "phone_number" in update_data
-            and update_data["phone_number"] != user.phone_number
-        ):
-            existing = await self.repo.get_by_phone_number(update_data["phone_number"])
-            if existing and existing.id != user.id:
-                raise AppException(UserErrorCode.PHONE_EXIST)
-
-        if "email" in update_data and update_data["email"] != user.email:
-            # Email 可能是 None，如果不是 None 再查重
-            if update_data["email"] is not None:
-                existing = await self.repo.get_by_email(update_data["email"])
-                if existing and existing.id != user.id:
-                    raise AppException(UserErrorCode.EMAIL_EXIST)
-
-        if "username" in update_data and update_data["username"] != user.username:
-            if update_data["username"] is not None:
-                existing = await self.repo.get_by_username(update_data["username"])
-                if existing and existing.id != user.id:
-                    raise AppException(UserErrorCode.USERNAME_EXIST)
-
-        # 3. 执行常规字段更新
+        # 2. 执行常规字段更新 + 提交事务
         # 注意：这里 update 方法应该只更新 update_data 中的字段
-        updated_user = await self.repo.update(user, update_data)
+        # 唯一性由数据库唯一约束保证 (乐观校验)：不做预查询，冲突时映射为业务错误码
+        # 既省去查重往返，也消除 "先查后写" 在并发更新下的竞态
+        try:
+            updated_user = await self.repo.update(user, update_data)
+            await self.repo.session.commit()
+        except IntegrityError as e:
+            await self.repo.session.rollback()
+            error_code = _unique_violation_error(e)
+            if error_code is None:
+                raise
+            raise AppException(error_code) from e
 
-        # 4. 提交事务
-        await self.repo.session.commit()
         await self.repo.session.refresh(updated_user)
 
         logger.bind(user_id=str(user_id)).info("User updated successfully")
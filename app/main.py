@@ -4,7 +4,7 @@ Description: FastAPI 应用入口与工厂函数
 
 本模块负责：
 1. 创建 FastAPI 应用实例 (设置默认响应类为 ORJSONResponse)
-2. 管理应用生命周期 (lifespan): 启动日志、关闭数据库与Redis连接
+2. 管理应用生命周期 (lifespan): 关闭数据库与Redis连接
 3. 组装全局组件：中间件、异常处理器、路由
 4. 提供健康检查接口 (/pinjie/health)
 
@@ -14,36 +14,48 @@ Updated: 2026-02-04 (Fix Windows EventLoop Policy)
 """
 
 import asyncio
+import hashlib
 import sys
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from typing import Any
 
 # ------------------------------------------------------------------------------
-# [Fix for Windows] 解决 Windows 下 asyncpg 连接重置/关闭的 Bug
+# [Event Loop] 事件循环选择
 # 必须在任何 asyncio 循环启动前执行 (放在顶部)
+# - Linux/macOS: uvloop 由 uvicorn[standard] 提供，uvicorn 默认 loop="auto" 自动启用
+# - Windows: 优先 winloop (libuv 实现，兼容 asyncpg)；未安装时回退 SelectorEventLoop
+#   (解决 asyncpg 在 ProactorEventLoop 下连接重置/关闭的 Bug)
 # ------------------------------------------------------------------------------
 if sys.platform == "win32":
-    # 强制使用 SelectorEventLoop (asyncpg 在 Windows 下必须使用此模式)
-    # ProactorEventLoop (Windows 默认) 不支持 asyncpg 所需的部分特性
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        import winloop
 
+        winloop.install()
+    except ImportError:
+        # ProactorEventLoop (Windows 默认) 不支持 asyncpg 所需的部分特性
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-from fastapi import FastAPI
+
+import orjson
+from fastapi import FastAPI, Request
 from fastapi.openapi.docs import get_redoc_html
-from fastapi.responses import ORJSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse, Response
 
 from app.api_router import api_router
 from app.core.config import settings
 
 # 直接导入封装好的注册函数
 from app.core.exceptions import register_exception_handlers
+from app.core.llm import close_llm_client
 from app.core.logging import setup_logging
-from app.core.middleware import register_middlewares
+from app.core.middleware import HealthCheckShortcutMiddleware, register_middlewares
 from app.core.redis import close_redis
 
 # [新增] 导入统一响应模型
 from app.core.response import ResponseModel
+from app.core.security import shutdown_hash_pool
+from app.core.static import CachedStaticFiles
 from app.db.session import engine
 
 
@@ -52,14 +64,16 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     应用生命周期管理器 (FastAPI 0.93+ 推荐方式)。
     """
-    # 1. 启动时：初始化日志系统
-    setup_logging()
-
+    # 启动阶段无需额外初始化 (日志系统已在 create_app 中配置)
     yield
 
-    # 2. 关闭时：优雅释放资源
+    # 关闭时：优雅释放资源
     # 关闭 Redis 连接池
     await close_redis()
+    # 关闭 LLM 客户端连接池
+    await close_llm_client()
+    # 关闭密码哈希线程池
+    shutdown_hash_pool()
     # 关闭数据库连接池
     await engine.dispose()
 
@@ -67,6 +81,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 def create_app() -> FastAPI:
     """应用工厂函数"""
 
+    # 最先初始化日志系统，保证后续组件注册期间的日志同样经过 Loguru
+    setup_logging()
+
     # 定义混淆前缀 (策略 B)
     obscure_prefix = "/pinjie"
 
@@ -83,24 +100,55 @@ def create_app() -> FastAPI:
         redoc_url=None,
     )
 
-    # 挂载静态文件目录 (ReDoc 本地化资源)
-    app.mount("/static", StaticFiles(directory="app/static"), name="static")
+    # 接管 OpenAPI Schema 路由: 默认实现每次请求都用标准库 JSONResponse 重新序列化
+    # 改为 orjson 序列化一次并缓存字节；app.openapi_schema 被重置 (如开发期热更新) 时自动重建
+    openapi_path = f"{obscure_prefix}/openapi.json"
+    app.router.routes[:] = [
+        route
+        for route in app.router.routes
+        if getattr(route, "path", None) != openapi_path
+    ]
+    openapi_cache: dict[str, Any] = {}
+
+    @app.get(openapi_path, include_in_schema=False)
+    async def openapi_json() -> Response:
+        schema = app.openapi()
+        if openapi_cache.get("schema") is not schema:
+            openapi_cache["schema"] = schema
+            openapi_cache["body"] = orjson.dumps(schema)
+        return Response(content=openapi_cache["body"], media_type="application/json")
+
+    # 挂载静态文件目录 (ReDoc 本地化资源，启动时载入内存并预压缩)
+    app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
+
+    # 自定义 ReDoc 页面 (输入均为静态值，应用创建时渲染一次)
+    # - JS/Favicon: 使用本地资源 (快且稳)
+    # - Fonts: 禁用 Google Fonts，直接使用系统字体 (最快)
+    redoc_body = bytes(
+        get_redoc_html(
+            openapi_url=openapi_path,
+            title=f"{settings.PROJECT_NAME} - ReDoc",
+            redoc_js_url="/static/redoc.standalone.js",
+            redoc_favicon_url="/static/favicon.png",
+            with_google_fonts=False,
+        ).body
+    )
+    redoc_etag = f'"{hashlib.blake2b(redoc_body, digest_size=8).hexdigest()}"'
 
     # 自定义 ReDoc 路由 (极简本地化版)
     @app.get(f"{obscure_prefix}/redoc", include_in_schema=False)
-    async def redoc_html():
+    async def redoc_html(request: Request) -> Response:
         """
         自定义 ReDoc 文档页面。
-        - JS/Favicon: 使用本地资源 (快且稳)
-        - Fonts: 禁用 Google Fonts，直接使用系统字体 (最快)
+        返回预渲染的 HTML，支持 If-None-Match 协商缓存 (304)。
         """
-        return get_redoc_html(
-            openapi_url=f"{obscure_prefix}/openapi.json",
-            title=f"{settings.PROJECT_NAME} - ReDoc",
-            redoc_js_url="/static/redoc.standalone.js",
-            redoc_favicon_url="/static/favicon.png",
-            with_google_fonts=False,
-        )
+        headers = {"ETag": redoc_etag}
+        if_none_match = request.headers.get("if-none-match", "")
+        if redoc_etag in (
+            c.strip().removeprefix("W/") for c in if_none_match.split(",")
+        ):
+            return Response(status_code=304, headers=headers)
+        return Response(content=redoc_body, media_type="text/html", headers=headers)
 
     # 1. 注册中间件 (CORS, RequestID, Logging)
     register_middlewares(app)
@@ -111,20 +159,38 @@ def create_app() -> FastAPI:
     # 3. 挂载 API 路由
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
+    # 静态响应数据 (应用创建时构建一次，请求时仅序列化信封)
+    health_data = {"status": "ok"}
+    root_message = f"Welcome to {settings.PROJECT_NAME}"
+    root_data = {
+        "status": "running",
+        "docs_url": f"{obscure_prefix}/docs",  # 动态获取混淆地址
+        "redoc_url": f"{obscure_prefix}/redoc",  # 动态获取混淆地址
+        "health_url": f"{obscure_prefix}/health",  # 健康检查地址
+    }
+
     # 4. 挂载健康检查
     @app.get(
         f"{obscure_prefix}/health",
         tags=["health"],
         summary="健康检查",
-        response_model=ResponseModel[dict[str, str]],
+        response_model=None,
+        responses={200: {"model": ResponseModel[dict[str, str]]}},
     )
-    async def health_check():
+    async def health_check() -> Response:
         """
         健康检查接口。
         用于 K8s Liveness/Readiness Probe 或负载均衡器检查。
         返回统一响应信封。
         """
-        return ResponseModel.success(data={"status": "ok"})
+        return ResponseModel.success_response(health_data)
+
+    # 健康检查快速通道: 注册为最外层中间件，探针请求不进入路由与日志中间件
+    app.add_middleware(
+        HealthCheckShortcutMiddleware,
+        path=f"{obscure_prefix}/health",
+        data=health_data,
+    )
 
     # 5. [新增] 根路由 (Root Endpoint)
     @app.get(
@@ -132,22 +198,15 @@ def create_app() -> FastAPI:
         tags=["root"],
         summary="系统入口",
         description="返回系统欢迎信息及关键入口链接。",
-        response_model=ResponseModel[dict[str, str]],
+        response_model=None,
+        responses={200: {"model": ResponseModel[dict[str, str]]}},
     )
-    async def root():
+    async def root() -> Response:
         """
         系统根路径。
         提供友好的欢迎信息，并暴露(混淆后的)文档地址，方便开发者跳转。
         """
-        return ResponseModel.success(
-            message=f"Welcome to {settings.PROJECT_NAME}",
-            data={
-                "status": "running",
-                "docs_url": f"{obscure_prefix}/docs",  # 动态获取混淆地址
-                "redoc_url": f"{obscure_prefix}/redoc",  # 动态获取混淆地址
-                "health_url": f"{obscure_prefix}/health",  # 健康检查地址
-            },
-        )
+        return ResponseModel.success_response(root_data, message=root_message)
 
     return app
 
@@ -156,7 +215,21 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
-    # 本地调试入口
+    # 本地/单机运行入口
+    # - Linux/macOS: loop/http 均为 auto，已安装 uvloop / httptools 时 uvicorn 自动优先使用，
+    #   未安装 (如按 Windows 冻结的 requirements.txt 部署) 时回退 asyncio / h11
+    # - Windows: loop="none" 沿用顶部已安装的 winloop / SelectorEventLoop 策略
+    # - 多进程: settings.WEB_WORKERS (>1 时需以导入字符串形式传入应用)
+    # - 访问日志由 RequestLogMiddleware 统一记录，关闭 uvicorn 自带的 access log
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="none" if sys.platform == "win32" else "auto",
+        http="auto",
+        workers=settings.WEB_WORKERS,
+        access_log=False,
+        log_level="info",
+    )
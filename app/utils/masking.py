@@ -7,34 +7,61 @@ Description: PII 数据脱敏工具 (Data Masking)
 
 特性：
 1. 针对性脱敏: 手机号、邮箱、身份证等特定格式。
-2. 递归脱敏: 能够深度遍历字典/列表，自动过滤敏感 Key (如 password, token)。
-3. 高性能: 使用预编译正则和字符串切片。
+2. 递归脱敏: 能够深度遍历字典/列表 (显式栈迭代，限制最大深度)，自动过滤敏感 Key (如 password, token)。
+3. 文本扫描: 可选地以预编译正则识别字符串中的手机号/邮箱/身份证号 (mask_string_pii)。
+4. 高性能: 使用预编译正则和字符串切片。
 
 Author: jinmozhe
 Created: 2025-11-26
 """
 
+import re
 from typing import Any
 
 # ==============================================================================
 # 1. 敏感字段黑名单 (大小写不敏感)
 # ==============================================================================
-SENSITIVE_KEYS = {
-    "password",
-    "passwd",
-    "secret",
-    "token",
-    "access_token",
-    "refresh_token",
-    "api_key",
-    "session_id",
-    "client_secret",
-    "credit_card",
-    "card_number",
-    "cvv",
-    "id_card",
-    "identity_card",
-}
+SENSITIVE_KEYS = frozenset(
+    {
+        "password",
+        "passwd",
+        "secret",
+        "token",
+        "access_token",
+        "refresh_token",
+        "api_key",
+        "session_id",
+        "client_secret",
+        "credit_card",
+        "card_number",
+        "cvv",
+        "id_card",
+        "identity_card",
+    }
+)
+
+# 快速匹配集合: 预展开常见大小写写法 (password / PASSWORD / Password)
+# 命中时免去逐 Key 的 lower() 调用与临时字符串分配，未命中才回退到 lower()
+_SENSITIVE_FAST = frozenset(
+    variant
+    for key in SENSITIVE_KEYS
+    for variant in (key, key.upper(), key.capitalize())
+)
+
+# 完全掩盖占位符 (字面量常量，全模块共用同一对象)
+_MASK = "******"
+
+# 递归脱敏的最大嵌套深度，超出部分以占位符替代
+_MAX_DEPTH = 32
+_TRUNCATED = "<truncated>"
+
+# 自由文本 PII 识别 (模块加载时预编译)
+# 使用数字/字母环视而非 \b：中文字符属于 \w，\b 在 "手机13800138000" 中无法命中
+_ID_CARD_RE = re.compile(r"(?<![0-9A-Za-z])(\d)\d{16}([\dXx])(?![0-9A-Za-z])")
+_PHONE_RE = re.compile(r"(?<![\d+])(\+?86)?(1[3-9]\d)\d{4}(\d{4})(?!\d)")
+_EMAIL_RE = re.compile(
+    r"(?<![A-Za-z0-9._%+-])([A-Za-z0-9])[A-Za-z0-9._%+-]*(@[A-Za-z0-9.-]+\.[A-Za-z]{2,})"
+)
 
 # ==============================================================================
 # 2. 基础脱敏函数
@@ -48,7 +75,7 @@ def mask_phone(phone: str | None) -> str:
     示例: 13800138000 -> 138****8000
     """
     if not phone or len(phone) < 7:
-        return "******"
+        return _MASK
     return f"{phone[:3]}****{phone[-4:]}"
 
 
@@ -59,7 +86,7 @@ def mask_email(email: str | None) -> str:
     示例: jinmozhe@example.com -> j***@example.com
     """
     if not email or "@" not in email:
-        return "******"
+        return _MASK
 
     try:
         user_part, domain_part = email.split("@", 1)
@@ -69,7 +96,7 @@ def mask_email(email: str | None) -> str:
             masked_user = f"{user_part[0]}***"
         return f"{masked_user}@{domain_part}"
     except Exception:
-        return "******"
+        return _MASK
 
 
 def mask_id_card(id_card: str | None) -> str:
@@ -78,7 +105,7 @@ def mask_id_card(id_card: str | None) -> str:
     规则: 保留前1位和后1位 (极端保守策略)。
     """
     if not id_card or len(id_card) < 4:
-        return "******"
+        return _MASK
     return f"{id_card[0]}****************{id_card[-1]}"
 
 
@@ -89,7 +116,19 @@ def mask_secret(value: Any) -> str:
     """
     if value is None:
         return ""
-    return "******"
+    return _MASK
+
+
+def mask_string_pii(text: str) -> str:
+    """
+    扫描自由文本中的身份证号、手机号、邮箱并就地脱敏，其余字符保持不变。
+    规则与 mask_id_card / mask_phone / mask_email 一致。
+    示例: "联系 13800138000" -> "联系 138****8000"
+    """
+    # 身份证号优先处理，避免其中的数字片段被误识别为手机号
+    text = _ID_CARD_RE.sub(r"\1****************\2", text)
+    text = _PHONE_RE.sub(r"\1\2****\3", text)
+    return _EMAIL_RE.sub(r"\1***\2", text)
 
 
 # ==============================================================================
@@ -97,31 +136,68 @@ def mask_secret(value: Any) -> str:
 # ==============================================================================
 
 
-def mask_sensitive_data(data: Any) -> Any:
+def mask_sensitive_data(
+    data: Any, max_depth: int = _MAX_DEPTH, scan_strings: bool = False
+) -> Any:
     """
-    递归遍历数据结构（字典、列表），自动对敏感字段进行脱敏。
+    遍历数据结构（字典、列表），自动对敏感字段进行脱敏。
 
     用于在打印日志前处理 request body 或变量字典。
     注意：为了性能，此函数会返回数据的【浅拷贝】副本，不修改原数据。
+
+    实现为显式栈迭代 (单一栈帧，无逐节点递归开销)，
+    超过 max_depth 的子结构以占位符替代，防止恶意深层嵌套拖垮日志链路。
+
+    Args:
+        scan_strings: 是否对字符串值额外执行 mask_string_pii (默认关闭，避免误伤)
     """
-    if isinstance(data, dict):
-        # 字典处理：检查 Key 是否敏感
-        new_data = {}
-        for k, v in data.items():
-            if isinstance(k, str) and k.lower() in SENSITIVE_KEYS:
-                new_data[k] = mask_secret(v)
-            else:
-                new_data[k] = mask_sensitive_data(v)
-        return new_data
-
-    elif isinstance(data, list):
-        # 列表处理：递归处理每个元素
-        return [mask_sensitive_data(item) for item in data]
-
-    elif isinstance(data, str):
-        # 字符串尝试简单识别（可选，目前保持原样以避免误伤）
-        # 可以在此增加正则匹配手机号/邮箱的逻辑，但需评估性能损耗
-        return data
-
-    # 其他类型直接返回
-    return data
+    root: list[Any] = [None]
+    # 工作栈元素: (父容器, 键/下标, 原始值, 深度)
+    stack: list[tuple[Any, Any, Any, int]] = [(root, 0, data, 0)]
+
+    while stack:
+        parent, key, value, depth = stack.pop()
+
+        if isinstance(value, dict):
+            if depth >= max_depth:
+                parent[key] = _TRUNCATED
+                continue
+            # 字典处理：检查 Key 是否敏感，非敏感值入栈待处理
+            new_data: dict[Any, Any] = {}
+            parent[key] = new_data
+            for k, v in value.items():
+                if k in _SENSITIVE_FAST or (
+                    isinstance(k, str) and k.lower() in SENSITIVE_KEYS
+                ):
+                    # 内联 mask_secret，省去函数调用
+                    new_data[k] = "" if v is None else _MASK
+                elif isinstance(v, dict | list):
+                    new_data[k] = None  # 占位，保持原 Key 顺序
+                    stack.append((new_data, k, v, depth + 1))
+                elif scan_strings and isinstance(v, str):
+                    new_data[k] = mask_string_pii(v)
+                else:
+                    # 标量直接写入 (未开启 scan_strings 时字符串保持原样)
+                    new_data[k] = v
+
+        elif isinstance(value, list):
+            if depth >= max_depth:
+                parent[key] = _TRUNCATED
+                continue
+            # 列表处理：标量直接复制，容器元素入栈
+            new_list = list(value)
+            parent[key] = new_list
+            for i, item in enumerate(value):
+                if isinstance(item, dict | list):
+                    stack.append((new_list, i, item, depth + 1))
+                elif scan_strings and isinstance(item, str):
+                    new_list[i] = mask_string_pii(item)
+
+        elif scan_strings and isinstance(value, str):
+            parent[key] = mask_string_pii(value)
+
+        else:
+            # 其他类型直接返回
+            parent[key] = value
+
+    return root[0]
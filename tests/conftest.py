@@ -5,15 +5,18 @@ Description: Pytest 全局 Fixtures 配置 (Async + 独立测试库)
 修正说明：
 1. 移除了手动定义的 event_loop fixture (交给 pytest-asyncio 自动管理)
 2. 保留了 Windows 平台的 SelectorEventLoopPolicy 补丁
-3. 依赖 pyproject.toml 中的 asyncio_default_fixture_loop_scope = "session"
+3. 依赖 pyproject.toml 中的 asyncio_default_fixture_loop_scope / asyncio_default_test_loop_scope = "session"
+   (asyncio_mode=auto，测试函数无需 @pytest.mark.asyncio)
 
 Author: jinmozhe
 Created: 2025-11-26
 """
 
 import asyncio
+import os
 import sys
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any
 
 # ------------------------------------------------------------------------------
 # Windows 平台特定修复 (必须在任何 async 操作之前)
@@ -22,16 +25,22 @@ if sys.platform == "win32":
     # 强制使用 WindowsSelectorEventLoopPolicy 以解决 asyncpg 在 Windows 下的兼容性问题
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from sqlalchemy import insert, text
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
-    async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import NullPool
 
 from app.api.deps import get_db
+from app.core import security
 from app.core.config import settings
 from app.db.models import Base
 from app.main import app
@@ -42,15 +51,25 @@ from app.main import app
 
 TEST_DB_NAME = "fastapi_test"
 
+# pytest-xdist 并行: 每个 worker 使用独立测试库 (fastapi_test_gw0, ...)，互不干扰
+XDIST_WORKER = os.getenv("PYTEST_XDIST_WORKER")
+if XDIST_WORKER:
+    TEST_DB_NAME = f"{TEST_DB_NAME}_{XDIST_WORKER}"
+
 original_uri = settings.SQLALCHEMY_DATABASE_URI
 if original_uri:
-    from sqlalchemy.engine.url import make_url
-
     url = make_url(original_uri)
     test_url = url.set(database=TEST_DB_NAME)
     settings.SQLALCHEMY_DATABASE_URI = str(test_url)
 
 
+# 测试环境使用 argon2 最低成本参数 (生产默认约 64MiB 内存 / 3 轮迭代)
+# 哈希串内嵌参数，verify_password 仍可正确校验；仅影响测试进程
+security.password_hash = PasswordHash(
+    (Argon2Hasher(time_cost=1, memory_cost=8, parallelism=1),)
+)
+
+
 # ------------------------------------------------------------------------------
 # 2. 全局 Fixtures
 # ------------------------------------------------------------------------------
@@ -58,28 +77,59 @@ if original_uri:
 # 注意：已移除 event_loop fixture，由 pytest-asyncio 根据 pyproject.toml 配置自动管理
 
 
+@pytest_asyncio.fixture(scope="session", autouse=True)
+async def _warm_password_hashing() -> None:
+    """
+    会话开始时预热密码哈希 (argon2 后端加载 + 专用线程池线程创建)，
+    一次性开销计入 setup，而非首个调用 UserService.create 的用例。
+    """
+    await security.get_password_hash_async("warmup")
+
+
+async def _ensure_database(name: str) -> None:
+    """
+    辅助: 测试库不存在时自动创建 (经由维护库 postgres，CREATE DATABASE 需 AUTOCOMMIT)。
+    """
+    admin_url = make_url(str(settings.SQLALCHEMY_DATABASE_URI)).set(database="postgres")
+    admin_engine = create_async_engine(
+        admin_url, poolclass=NullPool, isolation_level="AUTOCOMMIT"
+    )
+    try:
+        async with admin_engine.connect() as conn:
+            exists = await conn.scalar(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {"name": name},
+            )
+            if not exists:
+                await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    finally:
+        await admin_engine.dispose()
+
+
 @pytest_asyncio.fixture(scope="session")
 async def db_engine() -> AsyncGenerator[AsyncEngine, None]:
     """
     创建测试专用的数据库引擎 (Session 级别)。
+    使用 NullPool：连接按需建立/关闭，无连接池簿记，dispose 无需回收空闲连接。
+    xdist 并行时先确保当前 worker 的独立测试库存在。
     """
+    if XDIST_WORKER:
+        await _ensure_database(TEST_DB_NAME)
+
     engine = create_async_engine(
         str(settings.SQLALCHEMY_DATABASE_URI),
         echo=False,
-        pool_pre_ping=True,
+        poolclass=NullPool,
     )
 
-    # 1. 测试开始前：重置 Schema
+    # 测试开始前：重置 Schema (整个测试会话仅执行一次 DDL)
+    # 各用例的数据由 db_session 的外层事务回滚清理，结束时无需 drop_all
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
 
     yield engine
 
-    # 2. 测试结束后：清理
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
     await engine.dispose()
 
 
@@ -87,32 +137,75 @@ async def db_engine() -> AsyncGenerator[AsyncEngine, None]:
 async def db_session(db_engine: AsyncEngine) -> AsyncGenerator[AsyncSession, None]:
     """
     获取测试用的数据库会话 (Function 级别)。
+
+    事务隔离：会话绑定到一个已开启外层事务的连接，
+    join_transaction_mode="create_savepoint" 使被测代码中的 commit/rollback
+    只作用于 SAVEPOINT；用例结束时回滚外层事务，数据不会泄漏到其他用例。
     """
-    async_session_factory = async_sessionmaker(
-        bind=db_engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-        autoflush=False,
-    )
+    async with db_engine.connect() as conn:
+        trans = await conn.begin()
+        session = AsyncSession(
+            bind=conn,
+            expire_on_commit=False,
+            autoflush=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await trans.rollback()
+
+
+@pytest.fixture
+def seed_rows(db_session: AsyncSession) -> Callable[..., Awaitable[None]]:
+    """
+    预置测试数据 (单条 Core INSERT 批量写入，绕过 Service)。
+
+    用法: await seed_rows(Model, [row, ...], **defaults)
+    - defaults 为各行共用字段 (行内同名字段优先)
+    - 各行字段需一致 (executemany 按首行字段编译)
+    """
+
+    async def _seed(
+        model: type[Base], rows: list[dict[str, Any]], **defaults: Any
+    ) -> None:
+        await db_session.execute(insert(model), [{**defaults, **row} for row in rows])
+        await db_session.flush()
 
-    async with async_session_factory() as session:
-        yield session
+    return _seed
+
+
+@pytest_asyncio.fixture(scope="session")
+async def asgi_client() -> AsyncGenerator[AsyncClient, None]:
+    """
+    会话级共享的异步 HTTP 客户端 (ASGITransport 与连接池仅初始化一次)。
+    用例请使用函数级的 client fixture，以获得依赖覆盖与事务隔离。
+    """
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",  # type: ignore
+    ) as ac:
+        yield ac
 
 
 @pytest_asyncio.fixture(scope="function")
-async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
+async def client(
+    asgi_client: AsyncClient, db_session: AsyncSession
+) -> AsyncGenerator[AsyncClient, None]:
     """
     获取异步 HTTP 客户端。
+    复用会话级客户端，仅按用例切换 get_db 覆盖 (指向当前用例的隔离会话)，
+    结束时恢复用例开始前的依赖覆盖快照。
     """
 
     async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
         yield db_session
 
+    overrides_snapshot = dict(app.dependency_overrides)
     app.dependency_overrides[get_db] = override_get_db
-
-    async with AsyncClient(
-        transport=ASGITransport(app=app), base_url="http://test"  # type: ignore
-    ) as ac:
-        yield ac
-
-    app.dependency_overrides.clear()
+    try:
+        yield asgi_client
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(overrides_snapshot)
@@ -0,0 +1,91 @@
+"""
+File: tests/unit/test_llm.py
+Description: LLM 上下文工具单元测试
+
+本模块测试 app.core.llm 中的 Token 预算工具：
+1. estimate_tokens 的中英文换算
+2. trim_history 按预算保留最近且连续的问答 (时间正序返回)
+
+Author: jinmozhe
+Created: 2026-02-10
+"""
+
+import pytest
+
+from app.core.llm import estimate_tokens, trim_history
+
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+# 10 个 ASCII 字符 -> int(10 * 0.3) + 1 = 4 Token，一轮问答共 8 Token
+_Q = "q" * 10
+_A = "a" * 10
+_ROUND_TOKENS = 8
+
+
+def rounds(n: int) -> list[tuple[str, str]]:
+    """
+    构造 n 轮 (旧 -> 新) 等长问答，以序号区分
+    """
+    return [(f"{_Q[:-1]}{i}", f"{_A[:-1]}{i}") for i in range(n)]
+
+
+# ------------------------------------------------------------------------------
+# Test Cases: estimate_tokens
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        pytest.param("", 1, id="empty"),
+        pytest.param("q" * 10, 4, id="ascii"),
+        pytest.param("中" * 10, 7, id="cjk"),
+        pytest.param("中" * 10 + "q" * 10, 10, id="mixed"),
+    ],
+)
+def test_estimate_tokens(text: str, expected: int) -> None:
+    """测试：中文按 0.6、其余字符按 0.3 Token 估算 (向下取整后 +1)"""
+    assert estimate_tokens(text) == expected
+
+
+# ------------------------------------------------------------------------------
+# Test Cases: trim_history
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    ("budget", "kept"),
+    [
+        pytest.param(_ROUND_TOKENS * 3, 3, id="fits-all"),
+        pytest.param(_ROUND_TOKENS * 2, 2, id="exact-budget"),
+        pytest.param(_ROUND_TOKENS * 2 - 1, 1, id="just-under"),
+        pytest.param(_ROUND_TOKENS - 1, 0, id="none-fits"),
+    ],
+)
+def test_trim_history_keeps_most_recent(budget: int, kept: int) -> None:
+    """测试：从最近一轮向前累加，超出预算即停止，结果保持时间正序"""
+    history = rounds(3)
+
+    result = trim_history(history, budget)
+
+    assert result == (history[-kept:] if kept else [])
+
+
+def test_trim_history_stops_at_first_overflow() -> None:
+    """测试：遇到超预算的一轮即停止，不跳过它去保留更早的短记录 (保证连续)"""
+    history = [("old", "short"), (_Q * 10, _A * 10), ("new", "short")]
+
+    result = trim_history(history, budget=_ROUND_TOKENS * 2)
+
+    assert result == [("new", "short")]
+
+
+def test_trim_history_skips_incomplete_records() -> None:
+    """测试：问题或回答为空的记录被跳过，不占用预算"""
+    history = [(_Q, _A), (_Q, None), ("", _A), (_Q, "")]
+
+    result = trim_history(history, budget=_ROUND_TOKENS)
+
+    assert result == [(_Q, _A)]
@@ -0,0 +1,102 @@
+"""
+File: tests/unit/test_marketing_etag.py
+Description: 营销报告列表 ETag 协商缓存单元测试
+
+本模块测试列表接口的 ETag 计算与 If-None-Match 匹配：
+1. ETag 随报告集合版本 (最近更新时间 / 记录数) 变化
+2. If-None-Match 解析 (多值、弱校验前缀 W/、通配符 *)
+
+Author: jinmozhe
+Created: 2026-02-10
+"""
+
+from datetime import UTC, datetime
+
+import pytest
+
+from app.domains.marketing.router import _etag_matches
+from app.domains.marketing.service import MarketingReportService
+
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+_UPDATED_AT = datetime(2026, 2, 10, 8, 30, tzinfo=UTC)
+
+
+class FakeReportRepository:
+    """
+    仅提供 get_reports_version 的仓储替身 (版本标识可直接指定)。
+    """
+
+    def __init__(self, max_updated_at: datetime | None, total: int) -> None:
+        self.version = (max_updated_at, total)
+
+    async def get_reports_version(
+        self, user_id: str, marketplace_id: str
+    ) -> tuple[datetime | None, int]:
+        return self.version
+
+
+async def demo_list_etag(max_updated_at: datetime | None, total: int) -> str:
+    """
+    按给定版本标识计算列表 ETag
+    """
+    service = MarketingReportService(
+        repo=FakeReportRepository(max_updated_at, total)  # type: ignore[arg-type]
+    )
+    return await service.get_demo_list_etag("user-1", "ATVPDKIKX0DER")
+
+
+# ------------------------------------------------------------------------------
+# Test Cases: get_demo_list_etag
+# ------------------------------------------------------------------------------
+
+
+async def test_etag_is_stable_quoted_string() -> None:
+    """测试：相同版本得到相同的强校验 ETag (带双引号)"""
+    etag = await demo_list_etag(_UPDATED_AT, 3)
+
+    assert etag == await demo_list_etag(_UPDATED_AT, 3)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert len(etag) == 2 + 32  # blake2b digest_size=16 -> 32 位十六进制
+
+
+@pytest.mark.parametrize(
+    ("max_updated_at", "total"),
+    [
+        pytest.param(datetime(2026, 2, 10, 8, 31, tzinfo=UTC), 3, id="updated"),
+        pytest.param(_UPDATED_AT, 2, id="deleted"),
+        pytest.param(None, 0, id="empty"),
+    ],
+)
+async def test_etag_changes_with_version(
+    max_updated_at: datetime | None, total: int
+) -> None:
+    """测试：更新时间或记录数任一变化 (含删除、清空) 均产生新的 ETag"""
+    assert await demo_list_etag(max_updated_at, total) != await demo_list_etag(
+        _UPDATED_AT, 3
+    )
+
+
+# ------------------------------------------------------------------------------
+# Test Cases: _etag_matches
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected"),
+    [
+        pytest.param(None, False, id="absent"),
+        pytest.param("", False, id="empty"),
+        pytest.param('"abc"', True, id="exact"),
+        pytest.param('W/"abc"', True, id="weak"),
+        pytest.param('"xyz", "abc"', True, id="list"),
+        pytest.param("*", True, id="wildcard"),
+        pytest.param('"xyz"', False, id="mismatch"),
+        pytest.param("abc", False, id="unquoted"),
+    ],
+)
+def test_etag_matches(if_none_match: str | None, expected: bool) -> None:
+    """测试：If-None-Match 的多值、弱校验与通配符匹配"""
+    assert _etag_matches(if_none_match, '"abc"') is expected
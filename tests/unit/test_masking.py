@@ -0,0 +1,176 @@
+"""
+File: tests/unit/test_masking.py
+Description: PII 脱敏工具单元测试
+
+本模块测试 app.utils.masking 的核心行为：
+1. 敏感 Key 脱敏 (大小写不敏感，None 值置空)
+2. 显式栈迭代下的嵌套结构复制 (不修改原数据，保持 Key 顺序)
+3. 最大深度截断 (超深嵌套以占位符替代，不触发递归上限)
+4. 自由文本 PII 识别 (mask_string_pii 及 scan_strings 开关)
+
+Author: jinmozhe
+Created: 2025-11-26
+"""
+
+from typing import Any
+
+import pytest
+
+from app.utils.masking import mask_sensitive_data, mask_string_pii
+
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+
+def nested_dicts(depth: int, leaf: Any = "leaf") -> dict[str, Any]:
+    """
+    构造 depth 层嵌套字典: {"n": {"n": ... {"n": leaf}}}
+    """
+    data: Any = leaf
+    for _ in range(depth):
+        data = {"n": data}
+    return data
+
+
+def unwrap(data: Any, depth: int) -> Any:
+    """
+    沿 "n" 键向下取 depth 层
+    """
+    for _ in range(depth):
+        data = data["n"]
+    return data
+
+
+# ------------------------------------------------------------------------------
+# Test Cases: mask_sensitive_data
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    ("key", "value", "expected"),
+    [
+        pytest.param("password", "p@ss", "******", id="lower"),
+        pytest.param("PASSWORD", "p@ss", "******", id="upper"),
+        pytest.param("Access_Token", "t", "******", id="mixed-case"),
+        pytest.param("api_key", None, "", id="none-value"),
+        pytest.param("token", {"nested": "x"}, "******", id="container-value"),
+    ],
+)
+def test_mask_sensitive_keys(key: str, value: Any, expected: str) -> None:
+    """测试：敏感 Key 不区分大小写，值整体掩盖 (None 置空)"""
+    masked = mask_sensitive_data({key: value, "username": "alice"})
+
+    assert masked == {key: expected, "username": "alice"}
+
+
+def test_mask_nested_structures_returns_copy() -> None:
+    """测试：嵌套字典/列表逐层脱敏，原数据不被修改，Key 顺序保持不变"""
+    data = {
+        "user": {"name": "alice", "password": "p"},
+        "items": [1, {"secret": "s", "ok": True}, ["x", {"cvv": "123"}]],
+        "note": "plain",
+    }
+
+    masked = mask_sensitive_data(data)
+
+    assert masked == {
+        "user": {"name": "alice", "password": "******"},
+        "items": [1, {"secret": "******", "ok": True}, ["x", {"cvv": "******"}]],
+        "note": "plain",
+    }
+    assert list(masked) == ["user", "items", "note"]
+    # 原数据保持不变
+    assert data["user"]["password"] == "p"
+    assert data["items"][1]["secret"] == "s"
+    assert masked["items"] is not data["items"]
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        pytest.param("plain", id="str"),
+        pytest.param(42, id="int"),
+        pytest.param(None, id="none"),
+    ],
+)
+def test_mask_scalar_passthrough(value: Any) -> None:
+    """测试：顶层为标量时原样返回"""
+    assert mask_sensitive_data(value) == value
+
+
+def test_mask_truncates_beyond_max_depth() -> None:
+    """测试：达到 max_depth 的子结构以占位符替代，之前的层级完整保留"""
+    masked = mask_sensitive_data(nested_dicts(5), max_depth=3)
+
+    assert unwrap(masked, 3) == "<truncated>"
+
+    # 深度未超限时完整复制
+    assert mask_sensitive_data(nested_dicts(5), max_depth=6) == nested_dicts(5)
+
+
+def test_mask_truncates_lists_beyond_max_depth() -> None:
+    """测试：列表同样受深度限制"""
+    masked = mask_sensitive_data({"a": [[["deep"]]]}, max_depth=2)
+
+    assert masked == {"a": ["<truncated>"]}
+
+
+def test_mask_deep_nesting_does_not_recurse() -> None:
+    """测试：远超解释器递归上限的嵌套不抛 RecursionError"""
+    masked = mask_sensitive_data(nested_dicts(5000))
+
+    assert unwrap(masked, 32) == "<truncated>"
+
+
+# ------------------------------------------------------------------------------
+# Test Cases: mask_string_pii
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        pytest.param("联系 13800138000", "联系 138****8000", id="phone"),
+        pytest.param("手机13800138000请回电", "手机138****8000请回电", id="phone-cjk"),
+        pytest.param("+8613800138000", "+86138****8000", id="phone-intl"),
+        pytest.param("邮箱 jinmozhe@example.com", "邮箱 j***@example.com", id="email"),
+        pytest.param(
+            "证件 11010519491231002X", "证件 1****************X", id="id-card"
+        ),
+        pytest.param(
+            "a@b.io 或 13912345678",
+            "a***@b.io 或 139****5678",
+            id="multiple",
+        ),
+    ],
+)
+def test_mask_string_pii(text: str, expected: str) -> None:
+    """测试：自由文本中的手机号/邮箱/身份证号就地脱敏，其余字符不变"""
+    assert mask_string_pii(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        pytest.param("订单号 123456789012345", id="long-digits"),
+        pytest.param("12800138000", id="invalid-prefix"),
+        pytest.param("138001380001", id="too-long"),
+        pytest.param("no pii here", id="plain"),
+    ],
+)
+def test_mask_string_pii_ignores_non_matches(text: str) -> None:
+    """测试：不符合格式的数字串与普通文本保持原样"""
+    assert mask_string_pii(text) == text
+
+
+def test_mask_scan_strings_toggle() -> None:
+    """测试：scan_strings 开启时才扫描字符串值 (含列表元素与顶层字符串)"""
+    data = {"msg": "call 13800138000", "tags": ["a@b.io"]}
+
+    assert mask_sensitive_data(data) == data
+    assert mask_sensitive_data(data, scan_strings=True) == {
+        "msg": "call 138****8000",
+        "tags": ["a***@b.io"],
+    }
+    assert mask_sensitive_data("13800138000", scan_strings=True) == "138****8000"
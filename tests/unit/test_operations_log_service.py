@@ -0,0 +1,162 @@
+"""
+File: tests/unit/test_operations_log_service.py
+Description: 运营日志分页单元测试
+
+本模块测试 OperationsLogService 的分页逻辑：
+1. OFFSET 分页的稳定排序 (created_at DESC, id DESC) 与单次往返总数
+2. Keyset 游标翻页 (next_cursor 逐页推进，末页返回 null)
+3. 页码越界 / 游标越界时回退 COUNT，仍返回正确总数
+
+Author: jinmozhe
+Created: 2026-02-10
+"""
+
+from collections.abc import Awaitable, Callable
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.operations_report import OperationsChangeLog
+from app.domains.operations.repository import OperationsLogRepository
+from app.domains.operations.schemas import ChangeLogListRequest
+from app.domains.operations.service import OperationsLogService
+
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+_SCOPE = {
+    "user_id": "user-log-1",
+    "marketplace_id": "ATVPDKIKX0DER",
+    "period_start": date(2026, 2, 2),
+    "period_end": date(2026, 2, 8),
+    "category": "risk",
+}
+_BASE_TIME = datetime(2026, 2, 9, 8, 0, tzinfo=UTC)
+
+# 5 条目标记录: 第 2/3 条 created_at 相同，依靠 id 决定先后
+_SEED_ROWS: list[tuple[int, datetime]] = [
+    (1, _BASE_TIME),
+    (2, _BASE_TIME + timedelta(minutes=1)),
+    (3, _BASE_TIME + timedelta(minutes=1)),
+    (4, _BASE_TIME + timedelta(minutes=2)),
+    (5, _BASE_TIME + timedelta(minutes=3)),
+]
+
+# 期望顺序 (created_at DESC, id DESC)
+_EXPECTED_IDS = [UUID(int=n) for n in (5, 4, 3, 2, 1)]
+
+# 写入范围内的 5 条记录，外加一条其他分类的干扰记录
+_SEED_LOG_ROWS: list[dict[str, Any]] = [
+    {**_SCOPE, "id": UUID(int=n), "content": {"n": n}, "created_at": created_at}
+    for n, created_at in _SEED_ROWS
+] + [
+    {
+        **_SCOPE,
+        "category": "opportunity",
+        "id": UUID(int=99),
+        "content": {"n": 99},
+        "created_at": _BASE_TIME + timedelta(hours=1),
+    }
+]
+
+
+def list_request(**kwargs: Any) -> ChangeLogListRequest:
+    """
+    构造限定在测试范围内的查询请求
+    """
+    return ChangeLogListRequest(**_SCOPE, **kwargs)
+
+
+# ------------------------------------------------------------------------------
+# Fixtures
+# ------------------------------------------------------------------------------
+
+
+@pytest.fixture
+async def log_service(
+    db_session: AsyncSession, seed_rows: Callable[..., Awaitable[None]]
+) -> OperationsLogService:
+    """
+    创建绑定测试 Session 的 OperationsLogService，并写入预置日志。
+    """
+    await seed_rows(OperationsChangeLog, _SEED_LOG_ROWS)
+    repo = OperationsLogRepository(model=None, session=db_session)  # type: ignore
+    return OperationsLogService(repo)
+
+
+# ------------------------------------------------------------------------------
+# Test Cases
+# ------------------------------------------------------------------------------
+
+
+async def test_offset_page_order_and_total(log_service: OperationsLogService) -> None:
+    """测试：OFFSET 分页按 (created_at, id) 倒序，总数仅统计过滤范围内的记录"""
+    first = await log_service.get_change_logs(list_request(page=1, page_size=2))
+    second = await log_service.get_change_logs(list_request(page=2, page_size=2))
+
+    assert [item.id for item in first.items] == _EXPECTED_IDS[:2]
+    assert [item.id for item in second.items] == _EXPECTED_IDS[2:4]
+    assert first.total == second.total == 5
+    # 满页返回末条记录作为游标
+    assert first.next_cursor == (first.items[-1].created_at, first.items[-1].id)
+
+
+async def test_cursor_walks_all_pages(log_service: OperationsLogService) -> None:
+    """测试：沿 next_cursor 翻页覆盖全部记录且不重不漏，末页游标为 null"""
+    seen: list[UUID] = []
+    cursor = None
+    for _ in range(len(_SEED_ROWS)):
+        resp = await log_service.get_change_logs(
+            list_request(page_size=2, cursor=cursor)
+        )
+        assert resp.total == 5
+        seen.extend(item.id for item in resp.items)
+        cursor = resp.next_cursor
+        if cursor is None:
+            break
+
+    assert seen == _EXPECTED_IDS
+
+
+async def test_cursor_ignores_page(log_service: OperationsLogService) -> None:
+    """测试：传入游标时忽略 page 参数"""
+    cursor = (_BASE_TIME + timedelta(minutes=2), UUID(int=4))
+
+    resp = await log_service.get_change_logs(
+        list_request(page=7, page_size=2, cursor=cursor)
+    )
+
+    assert [item.id for item in resp.items] == _EXPECTED_IDS[2:4]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        pytest.param({"page": 10}, id="page-out-of-range"),
+        pytest.param({"cursor": (_BASE_TIME, UUID(int=1))}, id="cursor-past-end"),
+    ],
+)
+async def test_empty_page_falls_back_to_count(
+    log_service: OperationsLogService, kwargs: dict[str, Any]
+) -> None:
+    """测试：越界的空页无法从窗口列取总数，回退 COUNT 后仍返回真实总数"""
+    resp = await log_service.get_change_logs(list_request(page_size=2, **kwargs))
+
+    assert resp.items == []
+    assert resp.total == 5
+    assert resp.next_cursor is None
+
+
+async def test_first_page_without_data(log_service: OperationsLogService) -> None:
+    """测试：无匹配数据时首页直接返回空列表与 0"""
+    resp = await log_service.get_change_logs(
+        ChangeLogListRequest(**{**_SCOPE, "user_id": "nobody"})
+    )
+
+    assert resp.items == []
+    assert resp.total == 0
+    assert resp.next_cursor is None
@@ -0,0 +1,180 @@
+"""
+File: tests/unit/test_static.py
+Description: 内存缓存静态资源服务单元测试
+
+本模块测试 CachedStaticFiles 的核心行为：
+1. 挂载前缀剥离与 404/405 处理
+2. If-None-Match 协商缓存 (304，含 W/ 前缀与逗号列表)
+3. 按 Accept-Encoding 选择 gzip 版本 (解析 q 值，q=0 视为拒绝；小文件不压缩)
+4. HEAD 请求只返回头部
+
+Author: jinmozhe
+Created: 2026-02-15
+"""
+
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.core.static import CachedStaticFiles
+
+# 可压缩的大文件 (高度重复，gzip 后必然更小) 与低于压缩阈值的小文件
+_LARGE_JS = b"console.log('redoc');\n" * 200
+_SMALL_CSS = b"body { margin: 0; }\n"
+
+# ------------------------------------------------------------------------------
+# Fixtures
+# ------------------------------------------------------------------------------
+
+
+@pytest.fixture
+async def static_client(tmp_path: Path) -> AsyncGenerator[AsyncClient, None]:
+    """
+    将临时目录挂载到 /static 的最小应用客户端。
+    """
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_bytes(_LARGE_JS)
+    (tmp_path / "style.css").write_bytes(_SMALL_CSS)
+
+    app = Starlette(routes=[Mount("/static", CachedStaticFiles(directory=tmp_path))])
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+# ------------------------------------------------------------------------------
+# Test Cases
+# ------------------------------------------------------------------------------
+
+
+async def test_static_serves_file(static_client: AsyncClient) -> None:
+    """测试：按挂载前缀之后的相对路径命中文件，并返回缓存头"""
+    response = await static_client.get(
+        "/static/style.css", headers={"Accept-Encoding": "identity"}
+    )
+
+    assert response.status_code == 200
+    assert response.content == _SMALL_CSS
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["cache-control"] == "public, max-age=86400"
+    assert response.headers["etag"].startswith('"')
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "expected_status"),
+    [
+        pytest.param("GET", "/static/missing.js", 404, id="not-found"),
+        pytest.param("POST", "/static/style.css", 405, id="method-not-allowed"),
+    ],
+)
+async def test_static_errors(
+    static_client: AsyncClient, method: str, path: str, expected_status: int
+) -> None:
+    """测试：未知路径返回 404，非 GET/HEAD 返回 405"""
+    response = await static_client.request(method, path)
+
+    assert response.status_code == expected_status
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        pytest.param("{etag}", id="exact"),
+        pytest.param("W/{etag}", id="weak"),
+        pytest.param('"other", {etag}', id="list"),
+    ],
+)
+async def test_static_if_none_match_returns_304(
+    static_client: AsyncClient, template: str
+) -> None:
+    """测试：If-None-Match 命中当前 ETag 时返回 304 且无响应体"""
+    first = await static_client.get("/static/js/app.js")
+    etag = first.headers["etag"]
+
+    response = await static_client.get(
+        "/static/js/app.js", headers={"If-None-Match": template.format(etag=etag)}
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+async def test_static_if_none_match_mismatch(static_client: AsyncClient) -> None:
+    """测试：ETag 不匹配时正常返回 200"""
+    response = await static_client.get(
+        "/static/js/app.js", headers={"If-None-Match": '"stale"'}
+    )
+
+    assert response.status_code == 200
+    assert response.content == _LARGE_JS
+
+
+async def test_static_gzip_negotiation(static_client: AsyncClient) -> None:
+    """测试：客户端接受 gzip 时返回压缩版本，否则返回原文"""
+    gzipped = await static_client.get(
+        "/static/js/app.js", headers={"Accept-Encoding": "gzip"}
+    )
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+    assert int(gzipped.headers["content-length"]) < len(_LARGE_JS)
+    # httpx 自动解压，内容应与原文一致
+    assert gzipped.content == _LARGE_JS
+
+    plain = await static_client.get(
+        "/static/js/app.js", headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in plain.headers
+    assert plain.content == _LARGE_JS
+
+    # ETag 基于原文计算，与编码无关
+    assert gzipped.headers["etag"] == plain.headers["etag"]
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected_gzip"),
+    [
+        pytest.param("gzip, deflate, br", True, id="list"),
+        pytest.param("br;q=1.0, gzip;q=0.5", True, id="weighted"),
+        pytest.param("*", True, id="wildcard"),
+        pytest.param("gzip;q=0", False, id="gzip-refused"),
+        pytest.param("*, gzip;q=0", False, id="wildcard-but-gzip-refused"),
+        pytest.param("x-gzipped", False, id="unknown-coding"),
+    ],
+)
+async def test_static_gzip_accept_encoding_parsing(
+    static_client: AsyncClient, accept_encoding: str, expected_gzip: bool
+) -> None:
+    """测试：按编码列表与 q 值判断是否接受 gzip (q=0 视为拒绝)"""
+    response = await static_client.get(
+        "/static/js/app.js", headers={"Accept-Encoding": accept_encoding}
+    )
+
+    assert (response.headers.get("content-encoding") == "gzip") is expected_gzip
+    assert response.content == _LARGE_JS
+
+
+async def test_static_small_file_not_compressed(static_client: AsyncClient) -> None:
+    """测试：低于压缩阈值的文件即使接受 gzip 也返回原文"""
+    response = await static_client.get(
+        "/static/style.css", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert "content-encoding" not in response.headers
+    assert response.content == _SMALL_CSS
+
+
+async def test_static_head_returns_headers_only(static_client: AsyncClient) -> None:
+    """测试：HEAD 请求返回与 GET 一致的 Content-Length，但不带响应体"""
+    response = await static_client.head(
+        "/static/js/app.js", headers={"Accept-Encoding": "identity"}
+    )
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(_LARGE_JS))
@@ -4,7 +4,7 @@ Description: 用户领域服务单元测试
 
 本模块测试 UserService 的核心业务逻辑：
 1. 正常用户创建 (Happy Path)
-2. 业务规则校验 (手机号/邮箱重复检测)
+2. 业务规则校验 (手机号/邮箱重复检测，含更新时的唯一约束冲突映射)
 3. 密码哈希安全验证
 4. 数据持久化验证
 
@@ -12,16 +12,29 @@ Author: jinmozhe
 Created: 2025-11-26
 """
 
+from collections.abc import Awaitable, Callable
+from typing import Any
+from uuid import UUID
+
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import AppException
-from app.core.security import verify_password
+from app.core.security import get_password_hash, verify_password
 from app.db.models.user import User
+from app.domains.users.constants import UserErrorCode
 from app.domains.users.repository import UserRepository
-from app.domains.users.schemas import UserCreate
+from app.domains.users.schemas import UserCreate, UserUpdate
 from app.domains.users.service import UserService
 
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+# 预置用户共用的密码哈希 (模块加载时计算一次)，配合 conftest 的 seed_rows 使用
+_SEED_HASHED_PASSWORD = get_password_hash("seed-password")
+
+
 # ------------------------------------------------------------------------------
 # Fixtures
 # ------------------------------------------------------------------------------
@@ -34,9 +47,9 @@ def user_service(db_session: AsyncSession) -> UserService:
 
     说明：
     - db_session 来自 tests/conftest.py，已指向测试专用 PostgreSQL 数据库
-    - 这里显式传入 User 模型，满足 BaseRepository 的泛型约束
+    - UserRepository 内部已绑定 User 模型，只需注入会话
     """
-    repo = UserRepository(model=User, session=db_session)
+    repo = UserRepository(session=db_session)
     return UserService(repo=repo)
 
 
@@ -45,7 +58,6 @@ def user_service(db_session: AsyncSession) -> UserService:
 # ------------------------------------------------------------------------------
 
 
-@pytest.mark.asyncio
 async def test_create_user_success(user_service: UserService) -> None:
     """测试：正常创建用户"""
     user_in = UserCreate(
@@ -76,51 +88,101 @@ async def test_create_user_success(user_service: UserService) -> None:
     # assert user.updated_at is not None
 
 
-@pytest.mark.asyncio
-async def test_create_user_duplicate_phone(user_service: UserService) -> None:
-    """测试：手机号重复注册应抛出异常"""
-    # 1. 先创建一个用户
-    user_in_1 = UserCreate(
-        phone_number="+8613800000002",
-        password="p1",
-    )
-    await user_service.create(user_in_1)
-
-    # 2. 尝试用相同手机号创建第二个用户
-    user_in_2 = UserCreate(
-        phone_number="+8613800000002",  # 重复
-        password="p2",
-        username="othername",
-    )
+@pytest.mark.parametrize(
+    ("seed", "second_kwargs", "expected_code", "expected_msg"),
+    [
+        pytest.param(
+            {"phone_number": "+8613800000002"},
+            {"phone_number": "+8613800000002", "username": "othername"},
+            UserErrorCode.PHONE_EXIST,
+            "手机号",
+            id="phone",
+        ),
+        pytest.param(
+            # 手机号不同，但邮箱相同
+            {"phone_number": "+8613800000003", "email": "duplicate@example.com"},
+            {"phone_number": "+8613800000004", "email": "duplicate@example.com"},
+            UserErrorCode.EMAIL_EXIST,
+            "邮箱",
+            id="email",
+        ),
+        pytest.param(
+            # 手机号/邮箱均不同，仅用户名相同
+            {"phone_number": "+8613800000005", "username": "dupname"},
+            {"phone_number": "+8613800000006", "username": "dupname"},
+            UserErrorCode.USERNAME_EXIST,
+            "用户名",
+            id="username",
+        ),
+    ],
+)
+async def test_create_user_duplicate(
+    user_service: UserService,
+    seed_rows: Callable[..., Awaitable[None]],
+    seed: dict[str, Any],
+    second_kwargs: dict[str, Any],
+    expected_code: UserErrorCode,
+    expected_msg: str,
+) -> None:
+    """测试：手机号/邮箱/用户名重复注册应抛出对应异常"""
+    # 1. 先预置一个用户
+    await seed_rows(User, [seed], hashed_password=_SEED_HASHED_PASSWORD)
+
+    # 2. 尝试用冲突字段创建第二个用户
+    user_in_2 = UserCreate(**second_kwargs, password="p2")
 
     # 3. 断言抛出 AppException
     with pytest.raises(AppException) as excinfo:
         await user_service.create(user_in_2)
 
-    assert excinfo.value.code == 40001
-    assert "手机号" in excinfo.value.message
-
-
-@pytest.mark.asyncio
-async def test_create_user_duplicate_email(user_service: UserService) -> None:
-    """测试：邮箱重复注册应抛出异常"""
-    # 1. 创建第一个用户
-    user_in_1 = UserCreate(
-        phone_number="+8613800000003",
-        email="duplicate@example.com",
-        password="p1",
-    )
-    await user_service.create(user_in_1)
-
-    # 2. 创建第二个用户 (手机号不同，但邮箱相同)
-    user_in_2 = UserCreate(
-        phone_number="+8613800000004",
-        email="duplicate@example.com",  # 重复
-        password="p2",
+    assert excinfo.value.code == expected_code.code
+    assert expected_msg in excinfo.value.message
+
+
+@pytest.mark.parametrize(
+    ("update_kwargs", "expected_code"),
+    [
+        pytest.param(
+            {"phone_number": "+8613800000010"}, UserErrorCode.PHONE_EXIST, id="phone"
+        ),
+        pytest.param(
+            {"email": "taken@example.com"}, UserErrorCode.EMAIL_EXIST, id="email"
+        ),
+        pytest.param(
+            {"username": "takenname"}, UserErrorCode.USERNAME_EXIST, id="username"
+        ),
+    ],
+)
+async def test_update_user_unique_violation(
+    user_service: UserService,
+    seed_rows: Callable[..., Awaitable[None]],
+    update_kwargs: dict[str, Any],
+    expected_code: UserErrorCode,
+) -> None:
+    """测试：更新为他人已占用的手机号/邮箱/用户名时，唯一约束冲突映射为对应错误码"""
+    # 1. 预置占用者与待更新用户
+    updater_id = UUID(int=11)
+    await seed_rows(
+        User,
+        [
+            {
+                "id": UUID(int=10),
+                "phone_number": "+8613800000010",
+                "email": "taken@example.com",
+                "username": "takenname",
+            },
+            {
+                "id": updater_id,
+                "phone_number": "+8613800000011",
+                "email": "updater@example.com",
+                "username": "updater",
+            },
+        ],
+        hashed_password=_SEED_HASHED_PASSWORD,
     )
 
+    # 2. 更新为冲突值 (无预查询，由数据库唯一约束拦截)
     with pytest.raises(AppException) as excinfo:
-        await user_service.create(user_in_2)
+        await user_service.update(updater_id, UserUpdate(**update_kwargs))
 
-    assert excinfo.value.code == 40002
-    assert "邮箱" in excinfo.value.message
+    assert excinfo.value.code == expected_code.code